@@ -3,7 +3,7 @@
 """
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict
 
 
 class Settings(BaseSettings):
@@ -14,12 +14,78 @@ class Settings(BaseSettings):
     spotify_client_secret: str = ""
     spotify_redirect_uri: str = "https://tys.flurisrv.ru/callback/spotify"
     
+    # Адреса внешних API (переопределяются для нагрузочных тестов со стабами)
+    spotify_api_url: str = "https://api.spotify.com/v1"
+    spotify_accounts_url: str = "https://accounts.spotify.com"
+    yandex_api_url: str = "https://api.music.yandex.net"
+    
     # Application
     app_url: str = "https://tys.flurisrv.ru"
     secret_key: str = "change-this-secret-key-in-production"
     
+    # HTTP таймауты (секунды) по классам эндпоинтов: connect, read, total.
+    # Класс "default" используется для незаданных значений и классов.
+    # Переопределяется JSON-ом целиком, например:
+    # HTTP_TIMEOUTS='{"default": {"connect": 5, "read": 20, "total": 30}, "search": {"total": 5}}'
+    http_timeouts: Dict[str, Dict[str, float]] = {
+        "default": {"connect": 5, "read": 20, "total": 30},
+        "auth": {"connect": 5, "read": 10, "total": 15},
+        "search": {"connect": 3, "read": 8, "total": 10},
+        "tracks": {"connect": 5, "read": 30, "total": 60},
+    }
+    
+    # Хеджирование поиска: если запрос не ответил за наблюдаемый p95,
+    # отправляется дубликат и используется первый ответ
+    search_hedging_enabled: bool = False
+    # Нижняя граница порога хеджирования (секунды)
+    search_hedge_min_delay: float = 0.2
+    # Максимальная доля дублирующих запросов от общего числа запросов
+    search_hedge_budget: float = 0.1
+    
+    # Кэши результатов поиска Spotify, проверки доступности и информации
+    # о треках Яндекса в пределах одной задачи переноса. Отключаются
+    # для сравнения в нагрузочных тестах (LOOKUP_CACHE_ENABLED=false)
+    lookup_cache_enabled: bool = True
+    # Сколько пользователей хранить найденные соответствия треков между
+    # переносами (повторный перенос проверяет их пачками). 0 - не хранить
+    match_store_max_users: int = 10000
+    
+    # Circuit breaker для Spotify и Яндекс Музыки
+    # Доля ошибок (исключения, 5xx, 429) в окне, при которой цепь размыкается
+    circuit_error_rate_threshold: float = 0.5
+    # Запрос дольше этого порога (секунды) считается медленным
+    circuit_slow_call_threshold: float = 5.0
+    # Доля медленных запросов в окне, при которой цепь размыкается
+    circuit_slow_rate_threshold: float = 0.8
+    # Размер окна (последние N запросов) и минимум запросов для решения
+    circuit_window_size: int = 20
+    circuit_min_calls: int = 10
+    # Сколько секунд цепь разомкнута до пробных запросов
+    circuit_open_timeout: float = 30.0
+    # Число пробных запросов в полуоткрытом состоянии
+    circuit_half_open_max_calls: int = 3
+    
+    # Нагрузка и readiness
+    # Сколько переносов выполняется одновременно, остальные ждут в очереди
+    max_concurrent_transfers: int = 10
+    # Пороги, при превышении которых /health/ready отвечает 503
+    readiness_max_queue: int = 20
+    readiness_max_loop_lag: float = 0.5
+    readiness_max_sessions: int = 10000
+    # Интервалы фоновых проверок (секунды)
+    loop_lag_interval: float = 0.5
+    health_probe_interval: float = 30.0
+    
     # Logging
     log_level: str = "INFO"
+    # Каталог для JSON логов (пустая строка - только вывод в консоль)
+    log_dir: str = "logs"
+    log_file_max_bytes: int = 10 * 1024 * 1024
+    log_file_backup_count: int = 5
+    # Размер очереди логов; при переполнении записи отбрасываются
+    log_queue_size: int = 10000
+    # Доля выводимых debug записей по отдельным трекам (1.0 - все)
+    log_track_sample_rate: float = 1.0
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,486 @@
+"""
+Нагрузочный сценарий: N пользователей проходят
+/auth/spotify -> /callback/spotify -> /yandex/playlists -> /transfer
+и переносят лайки и несколько выбранных плейлистов
+
+По умолчанию драйвер сам поднимает стабы внешних API и приложение
+(uvicorn) с переданной конфигурацией, поэтому запуски с разными
+настройками можно сравнивать между собой:
+
+    python -m loadtest.run --users 200 --concurrency 50 --output base.json
+    python -m loadtest.run --users 200 --concurrency 50 --workers 2 \\
+        --env MAX_CONCURRENT_TRANSFERS=20 --output w2.json
+    python -m loadtest.run --compare base.json w2.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+from loadtest.stub_upstreams import app_env
+
+STEPS = ("auth", "callback", "playlists", "transfer", "total")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Перцентиль q (0..1) по списку значений"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def library_sizes(users: int, median: int, sigma: float, maximum: int, seed: int) -> List[int]:
+    """
+    Размеры библиотек пользователей: логнормальное распределение
+    
+    У большинства пользователей сотни треков, у немногих - тысячи.
+    """
+    rng = random.Random(seed)
+    return [
+        max(1, min(maximum, int(rng.lognormvariate(0, sigma) * median)))
+        for _ in range(users)
+    ]
+
+
+def process_rss_mb(pid: int) -> Optional[float]:
+    """
+    RSS процесса и всех его потомков (воркеров uvicorn) в мегабайтах
+    
+    Работает только на Linux (/proc), иначе возвращает None.
+    """
+    total_kb = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+            try:
+                with open(f"/proc/{current}/task/{current}/children") as children:
+                    pending.extend(int(child) for child in children.read().split())
+            except OSError:
+                pass
+    except OSError:
+        return None
+    return round(total_kb / 1024, 1)
+
+
+class LoadTest:
+    """Класс, выполняющий сценарий и собирающий метрики"""
+    
+    def __init__(self, target: str, sizes: List[int], concurrency: int, ramp_up: float,
+                 sample_interval: float, request_timeout: float, app_pid: Optional[int],
+                 playlists_mean: float = 2.0, seed: int = 1):
+        """
+        Args:
+            target: Адрес приложения
+            sizes: Размер библиотеки для каждого пользователя
+            concurrency: Максимум одновременно активных пользователей
+            ramp_up: За сколько секунд запускаются все пользователи
+            sample_interval: Интервал снятия метрик приложения (секунды)
+            request_timeout: Таймаут одного запроса (секунды)
+            app_pid: PID приложения для замера памяти или None
+            playlists_mean: Среднее число переносимых плейлистов на пользователя (с лайками)
+            seed: Seed выбора плейлистов
+        """
+        self.target = target.rstrip("/")
+        self.sizes = sizes
+        self.concurrency = concurrency
+        self.ramp_up = ramp_up
+        self.sample_interval = sample_interval
+        self.request_timeout = request_timeout
+        self.app_pid = app_pid
+        self.playlists_mean = playlists_mean
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.errors: Dict[str, int] = {}
+        self.completed = 0
+        self.tracks_total = 0
+        self.tracks_found = 0
+        self.playlists_total = 0
+        self.timeline: List[Dict] = []
+    
+    def _error(self, step: str, reason: str) -> None:
+        """Учитывает ошибку шага"""
+        key = f"{step}:{reason}"
+        self.errors[key] = self.errors.get(key, 0) + 1
+    
+    def _select_playlists(self, index: int, playlists: List[Dict]) -> List[str]:
+        """
+        Выбирает плейлисты пользователя для переноса
+        
+        Лайки (первые в списке) выбираются всегда, как в интерфейсе; общее число
+        распределено экспоненциально со средним playlists_mean.
+        """
+        rng = random.Random(f"{self.seed}-{index}")
+        count = max(1, round(rng.expovariate(1 / self.playlists_mean))) if self.playlists_mean > 0 else 1
+        others = [playlist["kind"] for playlist in playlists[1:]]
+        return [playlists[0]["kind"]] + rng.sample(others, min(len(others), count - 1))
+    
+    async def _user(self, session: aiohttp.ClientSession, index: int, semaphore: asyncio.Semaphore) -> None:
+        """Сценарий одного пользователя"""
+        if self.ramp_up > 0:
+            await asyncio.sleep(self.ramp_up * index / len(self.sizes))
+        
+        async with semaphore:
+            started = time.monotonic()
+            
+            # 1. Редирект на авторизацию Spotify
+            step_start = time.monotonic()
+            try:
+                async with session.get(f"{self.target}/auth/spotify", allow_redirects=False) as response:
+                    await response.read()
+                    if response.status not in (302, 307):
+                        return self._error("auth", str(response.status))
+            except Exception as e:
+                return self._error("auth", type(e).__name__)
+            self.latencies["auth"].append(time.monotonic() - step_start)
+            
+            # 2. Callback с кодом авторизации
+            step_start = time.monotonic()
+            try:
+                async with session.get(
+                    f"{self.target}/callback/spotify",
+                    params={"code": f"user{index}"},
+                    allow_redirects=False
+                ) as response:
+                    await response.read()
+                    location = response.headers.get("Location", "")
+            except Exception as e:
+                return self._error("callback", type(e).__name__)
+            
+            session_id = parse_qs(urlparse(location).query).get("session_id", [None])[0]
+            if not session_id:
+                return self._error("callback", "no_session_id")
+            self.latencies["callback"].append(time.monotonic() - step_start)
+            
+            # 3. Список плейлистов Яндекса и выбор плейлистов для переноса
+            yandex_token = f"lt-{self.sizes[index]}-{index}"
+            step_start = time.monotonic()
+            try:
+                async with session.post(
+                    f"{self.target}/yandex/playlists",
+                    data={"yandex_token": yandex_token}
+                ) as response:
+                    playlists = (await response.json(content_type=None)).get("playlists")
+                    if response.status != 200 or not playlists:
+                        return self._error("playlists", str(response.status))
+            except Exception as e:
+                return self._error("playlists", type(e).__name__)
+            self.latencies["playlists"].append(time.monotonic() - step_start)
+            kinds = self._select_playlists(index, playlists)
+            
+            # 4. Перенос выбранных плейлистов
+            step_start = time.monotonic()
+            try:
+                async with session.post(
+                    f"{self.target}/transfer",
+                    data={"yandex_token": yandex_token, "session_id": session_id, "playlists": ",".join(kinds)}
+                ) as response:
+                    result = await response.json(content_type=None)
+                    if response.status != 200:
+                        return self._error("transfer", str(response.status))
+            except Exception as e:
+                return self._error("transfer", type(e).__name__)
+            self.latencies["transfer"].append(time.monotonic() - step_start)
+            
+            self.latencies["total"].append(time.monotonic() - started)
+            self.completed += 1
+            self.tracks_total += result.get("total_tracks", 0)
+            self.tracks_found += result.get("found_tracks", 0)
+            self.playlists_total += len(result.get("playlists", []))
+    
+    async def _sample(self, session: aiohttp.ClientSession, started: float) -> None:
+        """Периодически снимает метрики приложения"""
+        while True:
+            sample = {
+                "t": round(time.monotonic() - started, 1),
+                "completed": self.completed,
+                "errors": sum(self.errors.values()),
+            }
+            try:
+                async with session.get(f"{self.target}/health/ready") as response:
+                    ready = await response.json(content_type=None)
+                sample.update({
+                    "ready": ready.get("ready"),
+                    "event_loop_lag": ready.get("event_loop_lag"),
+                    "event_loop_lag_max": ready.get("event_loop_lag_max"),
+                    "active_transfers": ready.get("active_transfers"),
+                    "queued_transfers": ready.get("queued_transfers"),
+                })
+            except Exception as e:
+                sample["ready_error"] = type(e).__name__
+            
+            if self.app_pid:
+                sample["rss_mb"] = process_rss_mb(self.app_pid)
+            
+            self.timeline.append(sample)
+            await asyncio.sleep(self.sample_interval)
+    
+    async def run(self) -> Dict:
+        """Выполняет сценарий и возвращает отчёт"""
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        connector = aiohttp.TCPConnector(limit=0)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            started = time.monotonic()
+            sampler = asyncio.create_task(self._sample(session, started))
+            await asyncio.gather(*[
+                self._user(session, index, semaphore) for index in range(len(self.sizes))
+            ])
+            duration = time.monotonic() - started
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+        
+        return self.report(duration)
+    
+    def report(self, duration: float) -> Dict:
+        """Собирает итоговый отчёт"""
+        users = len(self.sizes)
+        lags = [s["event_loop_lag_max"] for s in self.timeline if s.get("event_loop_lag_max") is not None]
+        rss = [s["rss_mb"] for s in self.timeline if s.get("rss_mb") is not None]
+        
+        return {
+            "summary": {
+                "users": users,
+                "completed": self.completed,
+                "error_rate": round(1 - self.completed / users, 4) if users else 0.0,
+                "errors": self.errors,
+                "duration_s": round(duration, 2),
+                "throughput_users_per_s": round(self.completed / duration, 3) if duration else 0.0,
+                "throughput_tracks_per_s": round(self.tracks_total / duration, 1) if duration else 0.0,
+                "tracks_total": self.tracks_total,
+                "tracks_found": self.tracks_found,
+                "playlists_total": self.playlists_total,
+                "latency_s": {
+                    step: {
+                        name: round(value, 3) if value is not None else None
+                        for name, value in (
+                            ("p50", percentile(values, 0.5)),
+                            ("p90", percentile(values, 0.9)),
+                            ("p95", percentile(values, 0.95)),
+                            ("p99", percentile(values, 0.99)),
+                            ("max", max(values) if values else None),
+                        )
+                    }
+                    for step, values in self.latencies.items()
+                },
+                "event_loop_lag_max_s": max(lags) if lags else None,
+                "rss_mb_max": max(rss) if rss else None,
+            },
+            "timeline": self.timeline,
+        }
+
+
+def start_stubs(args: argparse.Namespace) -> subprocess.Popen:
+    """Запускает стабы внешних API отдельным процессом, как и приложение"""
+    command = [
+        sys.executable, "-m", "loadtest.stub_upstreams",
+        "--host", "127.0.0.1", "--port", str(args.stub_port),
+        "--latency-ms", str(args.stub_latency_ms),
+        "--not-found-rate", str(args.stub_not_found_rate),
+    ]
+    # Стабы печатают свои переменные окружения - в отчёте они не нужны
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+
+def start_app(args: argparse.Namespace, stub_url: str) -> subprocess.Popen:
+    """Запускает приложение с конфигурацией запуска"""
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = dict(os.environ)
+    env.update({
+        "SPOTIFY_CLIENT_ID": "loadtest",
+        "SPOTIFY_CLIENT_SECRET": "loadtest",
+        "APP_URL": app_url,
+        "SPOTIFY_REDIRECT_URI": f"{app_url}/callback/spotify",
+        "LOG_LEVEL": "WARNING",
+        "LOG_DIR": "",
+        # Проверяем доступность стабов чаще, чем реальных API
+        "HEALTH_PROBE_INTERVAL": "5",
+    })
+    env.update(app_env(stub_url))
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--no-access-log",
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    """Останавливает запущенный драйвером процесс"""
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    """Ждёт, пока адрес начнёт отвечать 200 (приложение или стабы)"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not respond in {timeout}s")
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """Поднимает окружение, выполняет сценарий и возвращает отчёт"""
+    stub_process = None
+    app_process = None
+    stub_url = args.stub_url
+    
+    try:
+        if not stub_url:
+            stub_process = start_stubs(args)
+            stub_url = f"http://127.0.0.1:{args.stub_port}"
+            await wait_until_up(f"{stub_url}/spotify/v1")
+        
+        target = args.target
+        app_pid = args.app_pid
+        if not target:
+            app_process = start_app(args, stub_url)
+            target = f"http://127.0.0.1:{args.app_port}"
+            app_pid = app_process.pid
+        
+        await wait_until_up(f"{target}/health/live")
+        
+        sizes = library_sizes(args.users, args.library_median, args.library_sigma, args.library_max, args.seed)
+        load_test = LoadTest(
+            target=target,
+            sizes=sizes,
+            concurrency=args.concurrency or args.users,
+            ramp_up=args.ramp_up,
+            sample_interval=args.sample_interval,
+            request_timeout=args.request_timeout,
+            app_pid=app_pid,
+            playlists_mean=args.playlists_mean,
+            seed=args.seed
+        )
+        report = await load_test.run()
+        report["config"] = {
+            "users": args.users,
+            "concurrency": args.concurrency or args.users,
+            "ramp_up": args.ramp_up,
+            "workers": args.workers if not args.target else None,
+            "env": args.env,
+            "library_median": args.library_median,
+            "library_sigma": args.library_sigma,
+            "library_max": args.library_max,
+            "playlists_mean": args.playlists_mean,
+            "stub_latency_ms": args.stub_latency_ms if not args.stub_url else None,
+        }
+        return report
+    
+    finally:
+        if app_process:
+            stop_process(app_process)
+        if stub_process:
+            stop_process(stub_process)
+
+
+def print_summary(summary: Dict) -> None:
+    """Выводит итоги запуска"""
+    print(f"Users: {summary['completed']}/{summary['users']} completed, "
+          f"error rate {summary['error_rate']:.2%}, duration {summary['duration_s']}s")
+    print(f"Throughput: {summary['throughput_users_per_s']} users/s, "
+          f"{summary['throughput_tracks_per_s']} tracks/s, "
+          f"{summary.get('playlists_total', 0)} playlists")
+    for step, values in summary["latency_s"].items():
+        print(f"  {step:<9} " + "  ".join(f"{name}={value}" for name, value in values.items()))
+    print(f"Event loop lag max: {summary['event_loop_lag_max_s']}s, RSS max: {summary['rss_mb_max']} MB")
+    if summary["errors"]:
+        print(f"Errors: {summary['errors']}")
+
+
+def compare(paths: List[str]) -> None:
+    """Выводит ключевые метрики нескольких отчётов рядом"""
+    reports = []
+    for path in paths:
+        with open(path, encoding="utf-8") as report_file:
+            reports.append(json.load(report_file))
+    
+    rows = [
+        ("users/s", lambda s: s["throughput_users_per_s"]),
+        ("tracks/s", lambda s: s["throughput_tracks_per_s"]),
+        ("error rate", lambda s: s["error_rate"]),
+        ("transfer p50", lambda s: s["latency_s"]["transfer"]["p50"]),
+        ("transfer p95", lambda s: s["latency_s"]["transfer"]["p95"]),
+        ("transfer p99", lambda s: s["latency_s"]["transfer"]["p99"]),
+        ("callback p95", lambda s: s["latency_s"]["callback"]["p95"]),
+        ("loop lag max", lambda s: s["event_loop_lag_max_s"]),
+        ("RSS max MB", lambda s: s["rss_mb_max"]),
+    ]
+    
+    width = max(14, *(len(os.path.basename(path)) + 2 for path in paths))
+    print(" " * 14 + "".join(os.path.basename(path).rjust(width) for path in paths))
+    for name, getter in rows:
+        print(name.ljust(14) + "".join(str(getter(report["summary"])).rjust(width) for report in reports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест OAuth + перенос")
+    parser.add_argument("--users", type=int, default=50, help="Число пользователей")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Максимум одновременных пользователей (0 - все сразу)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Время запуска всех пользователей, с")
+    parser.add_argument("--library-median", type=int, default=300, help="Медианный размер библиотеки")
+    parser.add_argument("--library-sigma", type=float, default=1.0, help="Разброс размера библиотеки")
+    parser.add_argument("--library-max", type=int, default=5000, help="Максимальный размер библиотеки")
+    parser.add_argument("--playlists-mean", type=float, default=2.0,
+                        help="Среднее число переносимых плейлистов на пользователя, включая лайки")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", help="Адрес уже запущенного приложения (иначе запускается своё)")
+    parser.add_argument("--app-pid", type=int, help="PID уже запущенного приложения для замера памяти")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1, help="Число воркеров uvicorn")
+    parser.add_argument("--env", action="append", default=[],
+                        help="Настройка приложения KEY=VALUE, можно указать несколько раз")
+    parser.add_argument("--stub-url", help="Адрес уже запущенных стабов (иначе запускаются свои)")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--stub-latency-ms", type=float, default=30.0)
+    parser.add_argument("--stub-not-found-rate", type=float, default=0.1)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--request-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="Куда сохранить отчёт в JSON")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT", help="Сравнить сохранённые отчёты")
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare(args.compare)
+        return
+    
+    report = asyncio.run(run(args))
+    print_summary(report["summary"])
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Локальные стабы Spotify и Яндекс Музыки для нагрузочных тестов
+
+Один aiohttp сервер отвечает на все эндпоинты, которые использует приложение:
+    /spotify/accounts/...  - авторизация Spotify (SPOTIFY_ACCOUNTS_URL)
+    /spotify/v1/...        - Spotify Web API (SPOTIFY_API_URL)
+    /yandex/...            - Yandex Music API (YANDEX_API_URL)
+
+Размер библиотеки пользователя задаётся токеном Яндекса: "lt-<n>-<seed>"
+даёт n лайкнутых треков. Кроме лайков у пользователя есть до MAX_PLAYLISTS
+плейлистов, которые в основном состоят из лайкнутых треков. Запуск отдельно:
+    python -m loadtest.stub_upstreams --port 9100
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+from typing import Dict, List
+
+from aiohttp import web
+
+# Размер общего каталога: треки пользователей частично пересекаются
+CATALOG_SIZE = 50000
+
+# Число плейлистов пользователя (кроме лайков) - от 1 до MAX_PLAYLISTS
+MAX_PLAYLISTS = 8
+# Доля треков плейлиста, которые есть среди лайков
+PLAYLIST_LIKED_SHARE = 0.8
+
+
+class StubUpstreams:
+    """Класс стабов с настраиваемыми задержкой и долей ненайденных треков"""
+    
+    def __init__(self, latency_ms: float = 30.0, latency_sigma: float = 0.5,
+                 not_found_rate: float = 0.1, unplayable_rate: float = 0.02):
+        """
+        Args:
+            latency_ms: Медианная задержка ответа в миллисекундах
+            latency_sigma: Сигма логнормального распределения задержки
+            not_found_rate: Доля треков, которых нет в Spotify
+            unplayable_rate: Доля найденных треков, недоступных в стране пользователя
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.not_found_rate = not_found_rate
+        self.unplayable_rate = unplayable_rate
+        self.requests: Dict[str, int] = {}
+    
+    async def _delay(self, endpoint: str) -> None:
+        """Имитирует задержку внешнего API и считает запросы"""
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if self.latency_ms > 0:
+            await asyncio.sleep(random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000)
+    
+    @staticmethod
+    def _bucket(value: str) -> float:
+        """Детерминированное число от 0 до 1 для строки"""
+        return int(hashlib.md5(value.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    
+    @staticmethod
+    def _library(token: str) -> List[str]:
+        """Возвращает ID треков библиотеки по токену 'lt-<n>-<seed>'"""
+        parts = token.split("-")
+        size = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 100
+        rng = random.Random(token)
+        return [str(rng.randrange(CATALOG_SIZE)) for _ in range(size)]
+    
+    @classmethod
+    def _playlists(cls, token: str) -> Dict[str, List[str]]:
+        """
+        Возвращает плейлисты пользователя: номер -> ID треков
+        
+        Каждый плейлист занимает 5-30% библиотеки, PLAYLIST_LIKED_SHARE его
+        треков берётся из лайков, остальные - из каталога.
+        """
+        library = cls._library(token)
+        rng = random.Random(f"{token}-playlists")
+        playlists = {}
+        
+        for kind in range(1000, 1000 + rng.randint(1, MAX_PLAYLISTS)):
+            size = max(5, int(len(library) * rng.uniform(0.05, 0.3)))
+            liked = min(len(library), int(size * PLAYLIST_LIKED_SHARE))
+            tracks = rng.sample(library, liked) + [
+                str(rng.randrange(CATALOG_SIZE)) for _ in range(size - liked)
+            ]
+            rng.shuffle(tracks)
+            playlists[str(kind)] = tracks
+        
+        return playlists
+    
+    def _spotify_track_known(self, track_id: str) -> bool:
+        """Есть ли трек с таким ID в стабовом Spotify (ID вида m<n> или s<n>)"""
+        return (
+            len(track_id) > 1 and track_id[0] in "ms" and track_id[1:].isdigit() and
+            self._bucket(f"nf{track_id[1:]}") >= self.not_found_rate
+        )
+    
+    # Spotify accounts
+    
+    async def spotify_authorize(self, request: web.Request) -> web.Response:
+        """Страница авторизации (драйвер сразу идёт на callback)"""
+        await self._delay("spotify.authorize")
+        return web.Response(text="ok")
+    
+    async def spotify_token(self, request: web.Request) -> web.Response:
+        """Обмен code на токены"""
+        await self._delay("spotify.token")
+        data = await request.post()
+        code = data.get("code") or data.get("refresh_token") or "anon"
+        return web.json_response({
+            "access_token": f"access-{code}",
+            "refresh_token": f"refresh-{code}",
+            "expires_in": 3600
+        })
+    
+    # Spotify Web API
+    
+    async def spotify_me(self, request: web.Request) -> web.Response:
+        """Информация о пользователе"""
+        await self._delay("spotify.me")
+        token = request.headers.get("Authorization", "")
+        return web.json_response({
+            "id": f"user{int(self._bucket(token) * 1000000)}",
+            "country": "RU"
+        })
+    
+    async def spotify_search(self, request: web.Request) -> web.Response:
+        """Поиск трека: название трека в стабе - 'Track <id>'"""
+        await self._delay("spotify.search")
+        query = request.query.get("q", "")
+        track_id = query.split("track:Track ")[-1].split(" ")[0]
+        
+        if self._bucket(f"nf{track_id}") < self.not_found_rate:
+            return web.json_response({"tracks": {"items": []}})
+        
+        # Поиск с market возвращает только доступные треки
+        prefix = "m" if "market" in request.query else "s"
+        return web.json_response({"tracks": {"items": [{
+            "id": f"{prefix}{track_id}",
+            "uri": f"spotify:track:{prefix}{track_id}",
+            "name": f"Track {track_id}",
+            "artists": [{"name": f"Artist {int(track_id) % 500}"}]
+        }]}})
+    
+    async def spotify_tracks(self, request: web.Request) -> web.Response:
+        """Several tracks lookup: неизвестные ID приходят как null, как в Spotify API"""
+        await self._delay("spotify.tracks")
+        tracks = []
+        for track_id in request.query.get("ids", "").split(","):
+            if not self._spotify_track_known(track_id):
+                tracks.append(None)
+                continue
+            playable = self._bucket(f"up{track_id}") >= self.unplayable_rate
+            tracks.append({"id": track_id, "is_playable": playable})
+        return web.json_response({"tracks": tracks})
+    
+    async def spotify_create_playlist(self, request: web.Request) -> web.Response:
+        """Создание плейлиста"""
+        await self._delay("spotify.create_playlist")
+        playlist_id = f"pl{random.randrange(10 ** 9)}"
+        return web.json_response({
+            "id": playlist_id,
+            "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"}
+        }, status=201)
+    
+    async def spotify_add_tracks(self, request: web.Request) -> web.Response:
+        """Добавление треков в плейлист"""
+        await self._delay("spotify.add_tracks")
+        await request.read()
+        return web.json_response({"snapshot_id": "stub"}, status=201)
+    
+    # Yandex Music API
+    
+    async def yandex_status(self, request: web.Request) -> web.Response:
+        """Статус аккаунта"""
+        await self._delay("yandex.account_status")
+        token = request.headers.get("Authorization", "").replace("OAuth ", "")
+        if not token:
+            return web.json_response({"error": "unauthorized"}, status=401)
+        return web.json_response({"result": {"account": {"uid": token}}})
+    
+    async def yandex_likes(self, request: web.Request) -> web.Response:
+        """Лайкнутые треки"""
+        await self._delay("yandex.likes")
+        library = self._library(request.match_info["uid"])
+        return web.json_response({"result": {"library": {
+            "tracks": [{"id": track_id, "albumId": "1"} for track_id in library]
+        }}})
+    
+    async def yandex_playlists(self, request: web.Request) -> web.Response:
+        """Список плейлистов"""
+        await self._delay("yandex.playlists")
+        playlists = self._playlists(request.match_info["uid"])
+        return web.json_response({"result": [
+            {"kind": int(kind), "title": f"Playlist {kind}", "trackCount": len(tracks)}
+            for kind, tracks in playlists.items()
+        ]})
+    
+    async def yandex_playlist(self, request: web.Request) -> web.Response:
+        """Треки плейлиста"""
+        await self._delay("yandex.playlist")
+        kind = request.match_info["kind"]
+        playlists = self._playlists(request.match_info["uid"])
+        if kind not in playlists:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response({"result": {
+            "kind": int(kind),
+            "title": f"Playlist {kind}",
+            "tracks": [{"id": track_id, "albumId": "1"} for track_id in playlists[kind]]
+        }})
+    
+    async def yandex_tracks(self, request: web.Request) -> web.Response:
+        """Детальная информация о треках"""
+        await self._delay("yandex.tracks")
+        data = await request.json()
+        return web.json_response({"result": [
+            {
+                "id": track_id.split(":")[0],
+                "title": f"Track {track_id.split(':')[0]}",
+                "artists": [{"name": f"Artist {int(track_id.split(':')[0]) % 500}"}],
+                "albums": [{"title": "Album"}]
+            }
+            for track_id in data.get("track-ids", [])
+        ]})
+    
+    def make_app(self) -> web.Application:
+        """Создаёт aiohttp приложение со всеми маршрутами"""
+        app = web.Application()
+        app.router.add_get("/spotify/accounts/authorize", self.spotify_authorize)
+        app.router.add_post("/spotify/accounts/api/token", self.spotify_token)
+        app.router.add_get("/spotify/v1/me", self.spotify_me)
+        app.router.add_get("/spotify/v1/search", self.spotify_search)
+        app.router.add_get("/spotify/v1/tracks", self.spotify_tracks)
+        app.router.add_post("/spotify/v1/users/{user_id}/playlists", self.spotify_create_playlist)
+        app.router.add_post("/spotify/v1/playlists/{playlist_id}/tracks", self.spotify_add_tracks)
+        # Проба доступности из /health/ready
+        app.router.add_get("/spotify/v1", self.spotify_authorize)
+        app.router.add_get("/yandex/account/status", self.yandex_status)
+        app.router.add_get("/yandex/users/{uid}/likes/tracks", self.yandex_likes)
+        app.router.add_get("/yandex/users/{uid}/playlists/list", self.yandex_playlists)
+        app.router.add_get("/yandex/users/{uid}/playlists/{kind}", self.yandex_playlist)
+        app.router.add_post("/yandex/tracks", self.yandex_tracks)
+        return app
+
+
+def app_env(stub_url: str) -> Dict[str, str]:
+    """
+    Переменные окружения, направляющие приложение на стабы
+    
+    Args:
+        stub_url: Адрес стабов, например http://127.0.0.1:9100
+    """
+    return {
+        "SPOTIFY_API_URL": f"{stub_url}/spotify/v1",
+        "SPOTIFY_ACCOUNTS_URL": f"{stub_url}/spotify/accounts",
+        "YANDEX_API_URL": f"{stub_url}/yandex",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стабы Spotify и Яндекс Музыки")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--not-found-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    
+    stubs = StubUpstreams(latency_ms=args.latency_ms, not_found_rate=args.not_found_rate)
+    for key, value in app_env(f"http://{args.host}:{args.port}").items():
+        print(f"{key}={value}")
+    web.run_app(stubs.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
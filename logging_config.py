@@ -0,0 +1,166 @@
+"""
+Настройка логирования
+
+Записи из event loop кладутся в очередь (QueueHandler), а форматирование
+и запись в консоль и файлы выполняет отдельный поток (QueueListener),
+поэтому запись логов не блокирует обработку запросов.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import settings
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись как одну строку JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        """Возвращает JSON строку с временем, уровнем, логгером и сообщением"""
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TrackLogSampler(logging.Filter):
+    """
+    Пропускает только часть записей, помеченных extra={"sampled": True}
+    
+    Используется для debug записей по каждому треку: при rate=0.1
+    выводится каждая десятая такая запись. Остальные записи не фильтруются.
+    """
+    
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Доля пропускаемых записей от 0 до 1
+        """
+        super().__init__()
+        self.step = max(1, round(1 / rate)) if rate > 0 else 0
+        self._count = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Решает, пропускать ли запись"""
+        if not getattr(record, "sampled", False):
+            return True
+        if not self.step:
+            return False
+        
+        keep = self._count % self.step == 0
+        self._count += 1
+        return keep
+
+
+class LoopQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не блокирует event loop
+    
+    В отличие от стандартного не форматирует traceback в вызывающем потоке
+    (это делает поток-слушатель) и отбрасывает записи при переполнении
+    очереди вместо ошибки.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        """
+        Args:
+            log_queue: Очередь, которую читает QueueListener
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Подставляет аргументы в сообщение, traceback оставляет слушателю"""
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Кладёт запись в очередь, при переполнении отбрасывает её"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Настраивает корневой логгер и логгеры uvicorn на запись через очередь
+    
+    Вывод в консоль - в текстовом формате, в settings.log_dir/app.jsonl -
+    в JSON с ротацией по размеру. Повторный вызов возвращает уже
+    запущенный слушатель.
+    
+    Returns:
+        Запущенный QueueListener (остановить через stop_logging())
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [stream_handler]
+    
+    if settings.log_dir:
+        try:
+            os.makedirs(settings.log_dir, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                os.path.join(settings.log_dir, "app.jsonl"),
+                maxBytes=settings.log_file_max_bytes,
+                backupCount=settings.log_file_backup_count,
+                encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+        except OSError as e:
+            print(f"Не удалось открыть файл логов в {settings.log_dir}: {e}", file=sys.stderr)
+    
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    queue_handler = LoopQueueHandler(log_queue)
+    # Фильтр стоит на QueueHandler, чтобы отброшенные записи не попадали в очередь
+    queue_handler.addFilter(TrackLogSampler(settings.log_track_sample_rate))
+    
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(getattr(logging, settings.log_level))
+    
+    # uvicorn настраивает свои логгеры до импорта приложения - переводим их на очередь
+    for name in ("uvicorn", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers = [queue_handler]
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Останавливаем при выходе из процесса, а не при shutdown приложения,
+    # чтобы не потерять последние сообщения uvicorn
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    """Останавливает слушатель, дописав оставшиеся в очереди записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -16,8 +16,14 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import settings
+from logging_config import setup_logging
 from services.yandex_service import YandexMusicService
 from services.spotify_service import SpotifyService
+from services.transfer_service import STATUS_CIRCUIT_OPEN, TransferPausedError, TransferService
+from services.match_store import match_store
+from services.http_utils import get_timeout, latency_tracker
+from services.circuit_breaker import CircuitOpenError, breakers
+from services.health_service import health_monitor
 
 # Проверяем обязательные поля конфигурации
 try:
@@ -27,17 +33,14 @@ except ValueError as e:
     print(f"\n❌ Ошибка конфигурации:\n{e}\n", file=sys.stderr)
     sys.exit(1)
 
-# Настройка логирования
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Настройка логирования: запись через очередь и отдельный поток
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Инициализация FastAPI
 app = FastAPI(
     title="Yandex Music → Spotify Transfer",
-    description="Перенос плейлиста 'Мне нравится' из Яндекс Музыки в Spotify",
+    description="Перенос плейлистов Яндекс Музыки в Spotify",
     version="1.0.0"
 )
 
@@ -55,6 +58,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    """Запускает фоновые проверки состояния"""
+    await health_monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Останавливает фоновые проверки состояния"""
+    await health_monitor.stop()
+
+
 # Статические файлы и шаблоны
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
@@ -69,6 +84,38 @@ def generate_session_id() -> str:
     return secrets.token_urlsafe(32)
 
 
+def circuit_open_exception(error: CircuitOpenError) -> HTTPException:
+    """Преобразует CircuitOpenError в ответ 503 с заголовком Retry-After"""
+    return HTTPException(
+        status_code=503,
+        detail=f"Transfer paused: {error}",
+        headers={"Retry-After": str(int(error.retry_after) + 1)}
+    )
+
+
+def transfer_paused_response(error: TransferPausedError) -> JSONResponse:
+    """
+    Ответ 503 на перенос, прерванный разомкнутой цепью
+    
+    Кроме detail и Retry-After содержит результаты по всем плейлистам задачи
+    и номера неперенесённых (remaining_playlists), чтобы клиент повторил
+    перенос только для них.
+    """
+    retry_after = int(error.error.retry_after) + 1
+    return JSONResponse(
+        {
+            "detail": f"Transfer paused: {error.error}",
+            "retry_after": retry_after,
+            "playlists": error.results,
+            "remaining_playlists": [
+                result["kind"] for result in error.results if result["status"] == STATUS_CIRCUIT_OPEN
+            ]
+        },
+        status_code=503,
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Главная страница"""
@@ -90,7 +137,7 @@ async def spotify_auth():
         "show_dialog": "false"
     }
     
-    auth_url = f"https://accounts.spotify.com/authorize?{urlencode(params)}"
+    auth_url = f"{settings.spotify_accounts_url}/authorize?{urlencode(params)}"
     
     logger.info("Redirecting to Spotify authorization")
     return RedirectResponse(url=auth_url)
@@ -118,7 +165,7 @@ async def spotify_callback(code: Optional[str] = None, error: Optional[str] = No
             "redirect_uri": settings.spotify_redirect_uri,
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(timeout=get_timeout("auth")) as session:
             # Подготовка Basic Auth
             import base64
             auth_string = f"{settings.spotify_client_id}:{settings.spotify_client_secret}"
@@ -131,7 +178,7 @@ async def spotify_callback(code: Optional[str] = None, error: Optional[str] = No
             }
             
             async with session.post(
-                "https://accounts.spotify.com/api/token",
+                SpotifyService.TOKEN_URL,
                 data=token_data,
                 headers=headers
             ) as response:
@@ -168,14 +215,34 @@ async def spotify_callback(code: Optional[str] = None, error: Optional[str] = No
         return RedirectResponse(url=f"{settings.app_url}/?error=callback_error")
 
 
+@app.post("/yandex/playlists")
+async def yandex_playlists(yandex_token: str = Form(...)):
+    """
+    Возвращает список плейлистов пользователя Яндекс Музыки
+    Первым в списке идёт 'Мне нравится'
+    """
+    try:
+        yandex_service = YandexMusicService(yandex_token)
+        playlists = await yandex_service.get_playlists()
+        return JSONResponse({"playlists": playlists})
+    
+    except CircuitOpenError as e:
+        raise circuit_open_exception(e)
+    except Exception as e:
+        logger.exception(f"Error getting Yandex playlists: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not get Yandex Music playlists: {str(e)}")
+
+
 @app.post("/transfer")
 async def transfer_playlist(
     yandex_token: str = Form(...),
-    session_id: str = Form(...)
+    session_id: str = Form(...),
+    playlists: Optional[str] = Form(None)
 ):
     """
-    Основной endpoint для переноса плейлиста
-    Принимает токен Яндекс и session_id для Spotify токенов
+    Основной endpoint для переноса плейлистов
+    Принимает токен Яндекс, session_id для Spotify токенов и список
+    номеров плейлистов через запятую (по умолчанию 'Мне нравится')
     """
     # Проверяем наличие сессии Spotify
     if session_id not in session_storage:
@@ -198,81 +265,55 @@ async def transfer_playlist(
         else:
             raise HTTPException(status_code=401, detail="Spotify token expired. Please authorize again.")
     
+    kinds = [kind.strip() for kind in (playlists or "").split(",") if kind.strip()]
+    if not kinds:
+        kinds = [YandexMusicService.LIKES_KIND]
+    
     try:
-        # Получаем треки из Яндекс Музыки
-        logger.info("Fetching tracks from Yandex Music...")
+        # Один экземпляр сервисов на всю задачу - кэши общие для всех плейлистов
         yandex_service = YandexMusicService(yandex_token)
-        yandex_tracks = await yandex_service.get_liked_tracks()
-        
-        if not yandex_tracks:
-            raise HTTPException(status_code=400, detail="No tracks found in Yandex Music 'Мне нравится' playlist")
-        
-        logger.info(f"Found {len(yandex_tracks)} tracks in Yandex Music")
-        
-        # Ищем треки в Spotify и создаём плейлист
         spotify_service = SpotifyService(spotify_access_token)
+        transfer_service = TransferService(yandex_service, spotify_service, match_store)
         
-        # Получаем информацию о пользователе
-        user_info = await spotify_service.get_current_user()
-        user_id = user_info.get("id")
-        
-        if not user_id:
-            raise HTTPException(status_code=400, detail="Could not get Spotify user ID")
-        
-        # Создаём плейлист
-        playlist_name = "Яндекс Музыка – Мои лайки"
-        playlist = await spotify_service.create_playlist(user_id, playlist_name)
-        playlist_id = playlist.get("id")
-        playlist_url = playlist.get("external_urls", {}).get("spotify")
+        try:
+            # Ограничиваем число одновременных переносов, остальные ждут в очереди
+            async with health_monitor.transfer_slot():
+                results = await transfer_service.transfer_playlists(kinds)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except TransferPausedError as e:
+            logger.warning(f"Transfer paused: {e}")
+            return transfer_paused_response(e)
         
-        if not playlist_id:
-            raise HTTPException(status_code=500, detail="Failed to create Spotify playlist")
+        total_tracks = sum(result["total_tracks"] for result in results)
         
-        logger.info(f"Created playlist: {playlist_id}")
+        if not total_tracks:
+            raise HTTPException(status_code=400, detail="No tracks found in selected Yandex Music playlists")
         
-        # Ищем треки в Spotify
-        found_tracks = []
-        not_found_tracks = []
-        
-        for track in yandex_tracks:
-            spotify_track = await spotify_service.search_track(
-                track["title"],
-                track["artist"]
-            )
-            
-            if spotify_track:
-                found_tracks.append(spotify_track["id"])
-                logger.debug(f"Found: {track['artist']} - {track['title']}")
-            else:
-                not_found_tracks.append({
-                    "artist": track["artist"],
-                    "title": track["title"]
-                })
-                logger.debug(f"Not found: {track['artist']} - {track['title']}")
-        
-        # Добавляем найденные треки в плейлист (по 100 за раз - лимит Spotify API)
-        if found_tracks:
-            for i in range(0, len(found_tracks), 100):
-                batch = found_tracks[i:i + 100]
-                await spotify_service.add_tracks_to_playlist(playlist_id, batch)
-                logger.info(f"Added {len(batch)} tracks to playlist (batch {i//100 + 1})")
+        created = [result for result in results if result["playlist_id"]]
         
         # Очищаем сессию после успешного переноса
         # Можно оставить для возможности повторного использования
         # del session_storage[session_id]
         
-        # Возвращаем результат
+        # Возвращаем результат: сводка по всем плейлистам и детали по каждому
         return JSONResponse({
             "success": True,
-            "playlist_url": playlist_url,
-            "playlist_id": playlist_id,
-            "total_tracks": len(yandex_tracks),
-            "found_tracks": len(found_tracks),
-            "not_found_tracks": not_found_tracks
+            "playlist_url": created[0]["playlist_url"] if created else None,
+            "playlist_id": created[0]["playlist_id"] if created else None,
+            "total_tracks": total_tracks,
+            "found_tracks": sum(result["found_tracks"] for result in results),
+            "not_found_tracks": [
+                track for result in results for track in result["not_found_tracks"]
+            ],
+            "playlists": results
         })
     
     except HTTPException:
         raise
+    except CircuitOpenError as e:
+        logger.warning(f"Transfer aborted: {e}")
+        raise circuit_open_exception(e)
     except Exception as e:
         logger.exception(f"Error during transfer: {e}")
         raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
@@ -280,8 +321,43 @@ async def transfer_playlist(
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "ok", "service": "Yandex Music → Spotify Transfer"}
+    """
+    Health check endpoint
+    Показывает состояние circuit breaker для каждого внешнего API
+    и задержки запросов к ним (перцентили, число запросов и дубликатов)
+    """
+    upstreams = {name: breaker.status() for name, breaker in breakers.items()}
+    degraded = any(upstream["state"] != "closed" for upstream in upstreams.values())
+    
+    return {
+        "status": "degraded" if degraded else "ok",
+        "service": "Yandex Music → Spotify Transfer",
+        "upstreams": upstreams,
+        "latency": latency_tracker.stats()
+    }
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe
+    Отвечает, пока процесс жив и event loop обрабатывает запросы
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe
+    Возвращает 503, если инстанс перегружен, чтобы балансировщик направлял
+    запросы на другие инстансы. Доступность внешних API (проверяется в фоне)
+    и состояние circuit breaker выводятся, но на готовность не влияют
+    """
+    readiness = health_monitor.readiness(sessions=len(session_storage))
+    readiness["circuit_breakers"] = {name: breaker.status() for name, breaker in breakers.items()}
+    
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+"""
+Circuit breaker для внешних API (Spotify, Яндекс Музыка)
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+import aiohttp
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Цепь разомкнута: внешний API недоступен, запрос не отправлялся"""
+    
+    def __init__(self, upstream: str, retry_after: float):
+        """
+        Args:
+            upstream: Имя внешнего API
+            retry_after: Через сколько секунд будут разрешены пробные запросы
+        """
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(
+            f"{upstream} is temporarily unavailable, retry in {int(retry_after) + 1}s"
+        )
+
+
+class CallOutcome:
+    """Результат запроса внутри CircuitBreaker.guard()"""
+    
+    def __init__(self):
+        """Инициализация результата"""
+        self.failed = False
+    
+    def check_status(self, status: int) -> None:
+        """
+        Отмечает запрос неуспешным по HTTP статусу
+        
+        5xx и 429 говорят о проблемах на стороне API. Остальные 4xx -
+        ошибки конкретного запроса и на состояние цепи не влияют.
+        
+        Args:
+            status: HTTP статус ответа
+        """
+        if status >= 500 or status == 429:
+            self.failed = True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker с состояниями closed / open / half-open
+    
+    В состоянии closed запросы проходят, их результаты копятся в окне
+    последних circuit_window_size запросов. Если доля ошибок или медленных
+    запросов превышает порог, цепь размыкается (open) и запросы сразу
+    завершаются CircuitOpenError. Через circuit_open_timeout секунд цепь
+    переходит в half-open и пропускает несколько пробных запросов: если они
+    успешны, цепь замыкается, иначе снова размыкается.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str):
+        """
+        Инициализация
+        
+        Args:
+            name: Имя внешнего API
+        """
+        self.name = name
+        self.state = self.CLOSED
+        # Окно результатов: (ошибка, медленный)
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=settings.circuit_window_size)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+    
+    def _open(self) -> None:
+        """Размыкает цепь"""
+        if self.state != self.OPEN:
+            logger.warning(f"Circuit breaker '{self.name}' opened")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+    
+    def _close(self) -> None:
+        """Замыкает цепь и сбрасывает окно"""
+        logger.info(f"Circuit breaker '{self.name}' closed")
+        self.state = self.CLOSED
+        self._window.clear()
+    
+    def retry_after(self) -> float:
+        """Секунды до перехода из open в half-open"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + settings.circuit_open_timeout - time.monotonic())
+    
+    def before_call(self) -> None:
+        """
+        Проверяет, можно ли отправить запрос
+        
+        Raises:
+            CircuitOpenError: если цепь разомкнута или пробные запросы уже заняты
+        """
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.name, self.retry_after())
+            
+            logger.info(f"Circuit breaker '{self.name}' half-open, probing")
+            self.state = self.HALF_OPEN
+        
+        if self.state == self.HALF_OPEN:
+            if self._half_open_in_flight >= settings.circuit_half_open_max_calls:
+                raise CircuitOpenError(self.name, 1.0)
+            self._half_open_in_flight += 1
+    
+    def record(self, failed: bool, duration: float) -> None:
+        """
+        Сохраняет результат запроса и при необходимости меняет состояние
+        
+        Args:
+            failed: Запрос завершился ошибкой
+            duration: Длительность запроса в секундах
+        """
+        slow = duration > settings.circuit_slow_call_threshold
+        
+        if self.state == self.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            if failed or slow:
+                self._open()
+                return
+            
+            self._half_open_successes += 1
+            if self._half_open_successes >= settings.circuit_half_open_max_calls:
+                self._close()
+            return
+        
+        if self.state == self.OPEN:
+            # Ответ на запрос, отправленный до размыкания
+            return
+        
+        self._window.append((failed, slow))
+        if len(self._window) < settings.circuit_min_calls:
+            return
+        
+        error_rate = sum(1 for failed, _ in self._window if failed) / len(self._window)
+        slow_rate = sum(1 for _, slow in self._window if slow) / len(self._window)
+        
+        if (error_rate >= settings.circuit_error_rate_threshold or
+                slow_rate >= settings.circuit_slow_rate_threshold):
+            self._open()
+    
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[CallOutcome]:
+        """
+        Оборачивает запрос к внешнему API
+        
+        Ошибкой считаются сетевые ошибки и таймауты aiohttp внутри блока,
+        а также HTTP статус, переданный через outcome.check_status().
+        Прочие исключения (например, обработка 401) на цепь не влияют.
+        Отменённый запрос (например, проигравший хеджированный) не учитывается.
+        
+        Raises:
+            CircuitOpenError: если цепь разомкнута
+        """
+        self.before_call()
+        outcome = CallOutcome()
+        start = time.monotonic()
+        recorded = False
+        
+        try:
+            yield outcome
+        except Exception as e:
+            recorded = True
+            failed = outcome.failed or isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError))
+            self.record(failed, time.monotonic() - start)
+            raise
+        else:
+            recorded = True
+            self.record(outcome.failed, time.monotonic() - start)
+        finally:
+            if not recorded and self.state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+    
+    def status(self) -> Dict:
+        """
+        Возвращает состояние для /health
+        
+        Returns:
+            Словарь с состоянием, долей ошибок и временем до пробных запросов
+        """
+        calls = len(self._window)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "error_rate": round(sum(1 for failed, _ in self._window if failed) / calls, 3) if calls else 0.0,
+            "slow_rate": round(sum(1 for _, slow in self._window if slow) / calls, 3) if calls else 0.0,
+            "retry_after": round(self.retry_after(), 1)
+        }
+
+
+# Один breaker на каждый внешний API, общий для всех запросов процесса
+spotify_breaker = CircuitBreaker("spotify")
+yandex_breaker = CircuitBreaker("yandex")
+
+breakers: Dict[str, CircuitBreaker] = {
+    spotify_breaker.name: spotify_breaker,
+    yandex_breaker.name: yandex_breaker,
+}
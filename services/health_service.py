@@ -0,0 +1,176 @@
+"""
+Мониторинг состояния приложения для liveness / readiness проверок
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+import aiohttp
+
+from config import settings
+from services.http_utils import get_timeout
+from services.spotify_service import SpotifyService
+from services.yandex_service import YandexMusicService
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Класс для сбора состояния приложения
+    
+    Задержка event loop и доступность внешних API измеряются фоновыми
+    задачами, поэтому /health/ready только читает готовые значения и не
+    делает запросов наружу. Также ограничивает число одновременных
+    переносов: ожидающие слот переносы образуют очередь.
+    """
+    
+    UPSTREAMS = ("spotify", "yandex")
+    
+    # Сколько последних замеров задержки event loop хранить
+    LAG_WINDOW_SIZE = 20
+    
+    def __init__(self):
+        """Инициализация монитора"""
+        self.active_transfers = 0
+        self.queued_transfers = 0
+        self._transfer_slots: Optional[asyncio.Semaphore] = None
+        self._lag_samples: Deque[float] = deque(maxlen=self.LAG_WINDOW_SIZE)
+        self._upstreams: Dict[str, Dict] = {
+            name: {"reachable": None, "latency": None, "checked_at": None, "error": None}
+            for name in self.UPSTREAMS
+        }
+        self._tasks: List[asyncio.Task] = []
+    
+    async def start(self) -> None:
+        """Запускает фоновые задачи"""
+        self._transfer_slots = asyncio.Semaphore(settings.max_concurrent_transfers)
+        self._tasks = [
+            asyncio.create_task(self._measure_loop_lag()),
+            asyncio.create_task(self._probe_upstreams()),
+        ]
+    
+    async def stop(self) -> None:
+        """Останавливает фоновые задачи"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    @asynccontextmanager
+    async def transfer_slot(self) -> AsyncIterator[None]:
+        """
+        Занимает слот для переноса на время блока
+        
+        Если все max_concurrent_transfers слотов заняты, перенос ждёт в очереди.
+        """
+        if self._transfer_slots is None:
+            self._transfer_slots = asyncio.Semaphore(settings.max_concurrent_transfers)
+        
+        self.queued_transfers += 1
+        try:
+            await self._transfer_slots.acquire()
+        finally:
+            self.queued_transfers -= 1
+        
+        self.active_transfers += 1
+        try:
+            yield
+        finally:
+            self.active_transfers -= 1
+            self._transfer_slots.release()
+    
+    async def _measure_loop_lag(self) -> None:
+        """Периодически измеряет задержку event loop"""
+        interval = settings.loop_lag_interval
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            # Насколько позже запланированного loop вернул управление
+            self._lag_samples.append(max(0.0, time.monotonic() - start - interval))
+    
+    async def _probe_upstreams(self) -> None:
+        """Периодически проверяет доступность внешних API"""
+        while True:
+            # Любой HTTP ответ (даже 401) значит, что API доступен
+            probe_urls = {
+                "spotify": SpotifyService.BASE_URL,
+                "yandex": f"{YandexMusicService.BASE_URL}/account/status",
+            }
+            async with aiohttp.ClientSession(timeout=get_timeout("auth")) as session:
+                await asyncio.gather(*[
+                    self._probe(session, name, url) for name, url in probe_urls.items()
+                ])
+            await asyncio.sleep(settings.health_probe_interval)
+    
+    async def _probe(self, session: aiohttp.ClientSession, name: str, url: str) -> None:
+        """
+        Проверяет доступность одного внешнего API
+        
+        Args:
+            session: Открытая aiohttp сессия
+            name: Имя внешнего API
+            url: Адрес для проверки
+        """
+        start = time.monotonic()
+        try:
+            async with session.get(url) as response:
+                reachable = response.status < 500
+                error = None if reachable else f"HTTP {response.status}"
+        except Exception as e:
+            reachable = False
+            error = str(e) or type(e).__name__
+        
+        if reachable != self._upstreams[name]["reachable"]:
+            logger.info(f"Upstream '{name}' reachable: {reachable}")
+        
+        self._upstreams[name] = {
+            "reachable": reachable,
+            "latency": round(time.monotonic() - start, 3),
+            "checked_at": time.time(),
+            "error": error
+        }
+    
+    def readiness(self, sessions: int) -> Dict:
+        """
+        Собирает состояние для /health/ready
+        
+        Args:
+            sessions: Текущее число сессий в хранилище
+        
+        Returns:
+            Словарь с флагом ready, причинами неготовности (задержка event loop,
+            очередь переносов, число сессий) и метриками
+        """
+        loop_lag = self._lag_samples[-1] if self._lag_samples else 0.0
+        loop_lag_max = max(self._lag_samples) if self._lag_samples else 0.0
+        
+        reasons = []
+        if loop_lag > settings.readiness_max_loop_lag:
+            reasons.append("event_loop_lag")
+        if self.queued_transfers > settings.readiness_max_queue:
+            reasons.append("transfer_queue_full")
+        if sessions > settings.readiness_max_sessions:
+            reasons.append("too_many_sessions")
+        # Доступность внешних API только отображается: их недоступность
+        # затрагивает все инстансы, и снятие их с балансировки превратило бы
+        # сбой Spotify или Яндекса в полный отказ сервиса
+        
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "event_loop_lag": round(loop_lag, 4),
+            "event_loop_lag_max": round(loop_lag_max, 4),
+            "active_transfers": self.active_transfers,
+            "queued_transfers": self.queued_transfers,
+            "max_concurrent_transfers": settings.max_concurrent_transfers,
+            "sessions": sessions,
+            "upstreams": self._upstreams
+        }
+
+
+# Глобальный монитор приложения
+health_monitor = HealthMonitor()
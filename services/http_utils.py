@@ -0,0 +1,229 @@
+"""
+Вспомогательные средства для HTTP запросов к внешним API:
+таймауты по классам эндпоинтов, учёт задержек и хеджирование запросов
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import aiohttp
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def get_timeout(endpoint_class: str) -> aiohttp.ClientTimeout:
+    """
+    Возвращает таймауты для класса эндпоинтов
+    
+    Значения класса накладываются на значения "default" из settings.http_timeouts.
+    
+    Args:
+        endpoint_class: Класс эндпоинтов ("auth", "search", "tracks", ...)
+    
+    Returns:
+        aiohttp.ClientTimeout с таймаутами connect, sock_read и total
+    """
+    values = dict(settings.http_timeouts.get("default", {}))
+    values.update(settings.http_timeouts.get(endpoint_class, {}))
+    
+    return aiohttp.ClientTimeout(
+        total=values.get("total"),
+        connect=values.get("connect"),
+        sock_read=values.get("read")
+    )
+
+
+class LatencyTracker:
+    """
+    Учёт задержек запросов по эндпоинтам
+    
+    Хранит последние WINDOW_SIZE замеров на эндпоинт и считает по ним
+    перцентили. Также считает запросы и дубликаты для бюджета хеджирования.
+    """
+    
+    WINDOW_SIZE = 200
+    # Минимальное число замеров, после которого перцентилям можно доверять
+    MIN_SAMPLES = 20
+    # Окно (секунды), по которому считается бюджет хеджирования
+    HEDGE_WINDOW = 10.0
+    
+    def __init__(self):
+        """Инициализация трекера"""
+        self._samples: Dict[str, Deque[float]] = {}
+        self._requests: Dict[str, int] = {}
+        self._hedges: Dict[str, int] = {}
+        # Моменты запросов и дубликатов за последние HEDGE_WINDOW секунд
+        self._recent_requests: Dict[str, Deque[float]] = {}
+        self._recent_hedges: Dict[str, Deque[float]] = {}
+    
+    def record(self, endpoint: str, seconds: float) -> None:
+        """
+        Сохраняет замер задержки
+        
+        Args:
+            endpoint: Имя эндпоинта, например "spotify.search"
+            seconds: Длительность запроса в секундах
+        """
+        samples = self._samples.setdefault(endpoint, deque(maxlen=self.WINDOW_SIZE))
+        samples.append(seconds)
+    
+    def percentile(self, endpoint: str, q: float) -> Optional[float]:
+        """
+        Возвращает перцентиль задержки эндпоинта
+        
+        Args:
+            endpoint: Имя эндпоинта
+            q: Перцентиль от 0 до 1
+        
+        Returns:
+            Задержка в секундах или None, если замеров недостаточно
+        """
+        samples = self._samples.get(endpoint)
+        if not samples or len(samples) < self.MIN_SAMPLES:
+            return None
+        
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+    
+    def _trim(self, events: Deque[float], now: float) -> Deque[float]:
+        """Убирает из очереди события старше HEDGE_WINDOW секунд"""
+        while events and events[0] <= now - self.HEDGE_WINDOW:
+            events.popleft()
+        return events
+    
+    def count_request(self, endpoint: str) -> None:
+        """Учитывает основной запрос к эндпоинту"""
+        now = time.monotonic()
+        self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+        self._trim(self._recent_requests.setdefault(endpoint, deque()), now).append(now)
+    
+    def try_acquire_hedge(self, endpoint: str, budget: float) -> bool:
+        """
+        Проверяет бюджет и учитывает дублирующий запрос
+        
+        Бюджет считается по скользящему окну HEDGE_WINDOW секунд: неиспользованный
+        запас не копится, поэтому при замедлении API дубликаты не уходят пачкой.
+        
+        Args:
+            endpoint: Имя эндпоинта
+            budget: Максимальная доля дубликатов от числа основных запросов в окне
+        
+        Returns:
+            True если дубликат можно отправить
+        """
+        now = time.monotonic()
+        requests = self._trim(self._recent_requests.setdefault(endpoint, deque()), now)
+        hedges = self._trim(self._recent_hedges.setdefault(endpoint, deque()), now)
+        
+        if len(hedges) + 1 > budget * len(requests):
+            return False
+        
+        hedges.append(now)
+        self._hedges[endpoint] = self._hedges.get(endpoint, 0) + 1
+        return True
+    
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Возвращает сводку по всем эндпоинтам
+        
+        Returns:
+            Словарь эндпоинт -> {"samples", "p50", "p95", "p99", "requests", "hedges"}
+        """
+        endpoints = list(dict.fromkeys([*self._requests, *self._samples]))
+        return {
+            endpoint: {
+                "samples": len(self._samples.get(endpoint, ())),
+                "p50": self.percentile(endpoint, 0.5),
+                "p95": self.percentile(endpoint, 0.95),
+                "p99": self.percentile(endpoint, 0.99),
+                "requests": self._requests.get(endpoint, 0),
+                "hedges": self._hedges.get(endpoint, 0)
+            }
+            for endpoint in endpoints
+        }
+
+
+# Глобальный трекер: задержки наблюдаются по всем запросам процесса
+latency_tracker = LatencyTracker()
+
+
+async def timed_call(endpoint: str, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Выполняет запрос и сохраняет его задержку
+    
+    Для отменённого запроса (например, медленного, проигравшего дубликату)
+    сохраняется время до отмены, иначе p95 видел бы только победителей
+    и порог хеджирования занижался бы. Упавшие запросы не сохраняются.
+    
+    Args:
+        endpoint: Имя эндпоинта
+        call: Функция, создающая корутину запроса
+    
+    Returns:
+        Результат запроса
+    """
+    start = time.monotonic()
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        latency_tracker.record(endpoint, time.monotonic() - start)
+        raise
+    latency_tracker.record(endpoint, time.monotonic() - start)
+    return result
+
+
+async def hedged_call(endpoint: str, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Выполняет идемпотентный запрос с хеджированием
+    
+    Если запрос не ответил за наблюдаемый p95 эндпоинта (но не раньше
+    settings.search_hedge_min_delay), отправляется дубликат и возвращается
+    первый успешный ответ. Дубликаты ограничены бюджетом
+    settings.search_hedge_budget. Без хеджирования работает как timed_call.
+    
+    Args:
+        endpoint: Имя эндпоинта
+        call: Функция, создающая корутину запроса (вызывается на каждую попытку)
+    
+    Returns:
+        Результат первого успешного запроса
+    """
+    latency_tracker.count_request(endpoint)
+    
+    if not settings.search_hedging_enabled:
+        return await timed_call(endpoint, call)
+    
+    p95 = latency_tracker.percentile(endpoint, 0.95)
+    if p95 is None:
+        return await timed_call(endpoint, call)
+    
+    delay = max(p95, settings.search_hedge_min_delay)
+    pending = {asyncio.ensure_future(timed_call(endpoint, call))}
+    
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done and latency_tracker.try_acquire_hedge(endpoint, settings.search_hedge_budget):
+            logger.debug("Hedging %s request after %.3fs", endpoint, delay)
+            pending.add(asyncio.ensure_future(timed_call(endpoint, call)))
+        
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        
+        raise error
+    
+    finally:
+        # Проигравший или брошенный запрос больше не нужен
+        for task in pending:
+            task.cancel()
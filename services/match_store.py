@@ -0,0 +1,74 @@
+"""
+Хранилище найденных соответствий треков Яндекс Музыки трекам Spotify
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import settings
+
+
+class MatchStore:
+    """
+    Класс для хранения соответствий (название, исполнитель) -> ID трека Spotify
+    
+    Соответствия хранятся по пользователям Spotify в памяти процесса, как и
+    сессии. При повторном переносе сохранённые ID проверяются пачками через
+    GET /tracks вместо поиска каждого трека. Хранятся соответствия не более
+    settings.match_store_max_users пользователей: дольше всех не
+    использовавшиеся вытесняются, 0 отключает хранилище.
+    """
+    
+    def __init__(self):
+        """Инициализация хранилища"""
+        self._users: "OrderedDict[str, Dict[Tuple[str, str], str]]" = OrderedDict()
+    
+    @staticmethod
+    def _key(title: str, artist: str) -> Tuple[str, str]:
+        """Ключ трека"""
+        return title.lower().strip(), artist.lower().strip()
+    
+    def get(self, user_id: str, title: str, artist: str) -> Optional[str]:
+        """
+        Возвращает сохранённый ID трека Spotify
+        
+        Args:
+            user_id: ID пользователя Spotify
+            title: Название трека
+            artist: Исполнитель
+            
+        Returns:
+            ID трека или None, если соответствие не сохранено
+        """
+        matches = self._users.get(user_id)
+        if matches is None:
+            return None
+        
+        self._users.move_to_end(user_id)
+        return matches.get(self._key(title, artist))
+    
+    def set(self, user_id: str, title: str, artist: str, track_id: Optional[str]) -> None:
+        """
+        Сохраняет соответствие
+        
+        Args:
+            user_id: ID пользователя Spotify
+            title: Название трека
+            artist: Исполнитель
+            track_id: ID трека Spotify или None, чтобы удалить соответствие
+        """
+        if settings.match_store_max_users <= 0:
+            return
+        
+        if track_id is None:
+            self._users.get(user_id, {}).pop(self._key(title, artist), None)
+            return
+        
+        self._users.setdefault(user_id, {})[self._key(title, artist)] = track_id
+        self._users.move_to_end(user_id)
+        
+        while len(self._users) > settings.match_store_max_users:
+            self._users.popitem(last=False)
+
+
+# Глобальное хранилище: соответствия переиспользуются между задачами переноса
+match_store = MatchStore()
@@ -2,11 +2,13 @@
 Сервис для работы с Spotify API
 """
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import aiohttp
 import base64
 
 from config import settings
+from services.http_utils import get_timeout, hedged_call
+from services.circuit_breaker import CircuitOpenError, spotify_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +16,11 @@ logger = logging.getLogger(__name__)
 class SpotifyService:
     """Класс для взаимодействия с Spotify API"""
     
-    BASE_URL = "https://api.spotify.com/v1"
-    TOKEN_URL = "https://accounts.spotify.com/api/token"
+    BASE_URL = settings.spotify_api_url
+    TOKEN_URL = f"{settings.spotify_accounts_url}/api/token"
+    
+    # Лимит Spotify API на число ID в GET /tracks
+    SEVERAL_TRACKS_LIMIT = 50
     
     def __init__(self, access_token: str):
         """
@@ -29,6 +34,11 @@ class SpotifyService:
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
+        # Кэш результатов поиска: (название, исполнитель, страна) -> трек или None.
+        # Общий для всех плейлистов одного переноса
+        self._search_cache: Dict[Tuple[str, str, Optional[str]], Optional[Dict]] = {}
+        # Кэш проверки доступности: (ID трека, страна) -> доступный ID или None
+        self._playable_cache: Dict[Tuple[str, str], Optional[str]] = {}
     
     async def refresh_access_token(self, refresh_token: str) -> Optional[str]:
         """
@@ -55,7 +65,7 @@ class SpotifyService:
                 "Content-Type": "application/x-www-form-urlencoded"
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(timeout=get_timeout("auth")) as session:
                 async with session.post(
                     self.TOKEN_URL,
                     data=token_data,
@@ -80,11 +90,12 @@ class SpotifyService:
             Словарь с информацией о пользователе
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
+            async with aiohttp.ClientSession(timeout=get_timeout("default")) as session:
+                async with spotify_breaker.guard() as outcome, session.get(
                     f"{self.BASE_URL}/me",
                     headers=self.headers
                 ) as response:
+                    outcome.check_status(response.status)
                     if response.status != 200:
                         error_text = await response.text()
                         logger.error(f"Failed to get user info: {error_text}")
@@ -92,21 +103,45 @@ class SpotifyService:
                     
                     return await response.json()
         
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.exception(f"Error getting current user: {e}")
             raise
     
-    async def search_track(self, title: str, artist: str) -> Optional[Dict]:
+    @staticmethod
+    def _search_cache_key(title: str, artist: str, market: Optional[str]) -> Tuple[str, str, Optional[str]]:
+        """Ключ кэша поиска"""
+        return title.lower().strip(), artist.lower().strip(), market
+    
+    def is_search_cached(self, title: str, artist: str, market: Optional[str] = None) -> bool:
+        """
+        Проверяет, вернёт ли search_track результат из кэша без запроса
+        
+        Args:
+            title: Название трека
+            artist: Исполнитель
+            market: Код страны
+        """
+        return (settings.lookup_cache_enabled and
+                self._search_cache_key(title, artist, market) in self._search_cache)
+    
+    async def search_track(self, title: str, artist: str, market: Optional[str] = None) -> Optional[Dict]:
         """
         Ищет трек в Spotify по названию и исполнителю
         
         Args:
             title: Название трека
             artist: Исполнитель
+            market: Код страны - искать только треки, доступные в ней
             
         Returns:
             Словарь с информацией о найденном треке или None
         """
+        cache_key = self._search_cache_key(title, artist, market)
+        if settings.lookup_cache_enabled and cache_key in self._search_cache:
+            return self._search_cache[cache_key]
+        
         try:
             # Формируем поисковый запрос
             # Пытаемся найти точное совпадение или близкое
@@ -124,67 +159,173 @@ class SpotifyService:
             
             query = " ".join(query_parts) if query_parts else title
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.BASE_URL}/search",
-                    headers=self.headers,
-                    params={
-                        "q": query,
-                        "type": "track",
-                        "limit": 5  # Проверяем первые 5 результатов
-                    }
-                ) as response:
-                    if response.status != 200:
-                        logger.warning(f"Search failed for '{artist} - {title}': {response.status}")
-                        return None
-                    
-                    search_data = await response.json()
-                    tracks = search_data.get("tracks", {}).get("items", [])
-                    
-                    if not tracks:
-                        return None
-                    
-                    # Пытаемся найти наиболее подходящий трек
-                    # Проверяем совпадение названия и исполнителя
-                    title_lower = title.lower().split("(")[0].split("[")[0].strip()
-                    artist_lower = artist.lower()
-                    
-                    for track in tracks:
-                        track_title = track.get("name", "").lower()
-                        track_artists = [a.get("name", "").lower() for a in track.get("artists", [])]
-                        
-                        # Проверяем совпадение названия
-                        title_match = title_lower in track_title or track_title in title_lower
-                        
-                        # Проверяем совпадение хотя бы одного исполнителя
-                        artist_match = any(
-                            artist_part in track_artist or track_artist in artist_part
-                            for artist_part in artist_lower.split(",")
-                            for track_artist in track_artists
-                        )
-                        
-                        if title_match and artist_match:
-                            return {
-                                "id": track.get("id"),
-                                "uri": track.get("uri"),
-                                "name": track.get("name"),
-                                "artists": [a.get("name") for a in track.get("artists", [])]
-                            }
-                    
-                    # Если точного совпадения нет, возвращаем первый результат
-                    logger.debug(f"Exact match not found for '{artist} - {title}', using first result")
-                    first_track = tracks[0]
-                    return {
-                        "id": first_track.get("id"),
-                        "uri": first_track.get("uri"),
-                        "name": first_track.get("name"),
-                        "artists": [a.get("name") for a in first_track.get("artists", [])]
+            # Поиск идемпотентен, поэтому медленный запрос можно продублировать
+            status, search_data = await hedged_call(
+                "spotify.search",
+                lambda: self._search_request(query, market)
+            )
+            
+            if status != 200:
+                logger.warning("Search failed for '%s - %s': %s", artist, title, status)
+                return None
+            
+            tracks = search_data.get("tracks", {}).get("items", [])
+            
+            if not tracks:
+                self._search_cache[cache_key] = None
+                return None
+            
+            # Пытаемся найти наиболее подходящий трек
+            # Проверяем совпадение названия и исполнителя
+            title_lower = title.lower().split("(")[0].split("[")[0].strip()
+            artist_lower = artist.lower()
+            
+            for track in tracks:
+                track_title = track.get("name", "").lower()
+                track_artists = [a.get("name", "").lower() for a in track.get("artists", [])]
+                
+                # Проверяем совпадение названия
+                title_match = title_lower in track_title or track_title in title_lower
+                
+                # Проверяем совпадение хотя бы одного исполнителя
+                artist_match = any(
+                    artist_part in track_artist or track_artist in artist_part
+                    for artist_part in artist_lower.split(",")
+                    for track_artist in track_artists
+                )
+                
+                if title_match and artist_match:
+                    self._search_cache[cache_key] = {
+                        "id": track.get("id"),
+                        "uri": track.get("uri"),
+                        "name": track.get("name"),
+                        "artists": [a.get("name") for a in track.get("artists", [])]
                     }
+                    return self._search_cache[cache_key]
+            
+            # Если точного совпадения нет, возвращаем первый результат
+            logger.debug(
+                "Exact match not found for '%s - %s', using first result", artist, title,
+                extra={"sampled": True}
+            )
+            first_track = tracks[0]
+            self._search_cache[cache_key] = {
+                "id": first_track.get("id"),
+                "uri": first_track.get("uri"),
+                "name": first_track.get("name"),
+                "artists": [a.get("name") for a in first_track.get("artists", [])]
+            }
+            return self._search_cache[cache_key]
         
+        except CircuitOpenError:
+            # Цепь разомкнута - прерываем перенос, а не считаем трек ненайденным
+            raise
         except Exception as e:
-            logger.warning(f"Error searching track '{artist} - {title}': {e}")
+            logger.warning("Error searching track '%s - %s': %s", artist, title, e)
             return None
     
+    async def _search_request(self, query: str, market: Optional[str] = None) -> Tuple[int, Dict]:
+        """
+        Выполняет один запрос к /search
+        
+        Args:
+            query: Поисковый запрос
+            market: Код страны или None
+            
+        Returns:
+            Кортеж (HTTP статус, тело ответа или пустой словарь)
+        """
+        params = {
+            "q": query,
+            "type": "track",
+            "limit": 5  # Проверяем первые 5 результатов
+        }
+        if market:
+            params["market"] = market
+        
+        async with aiohttp.ClientSession(timeout=get_timeout("search")) as session:
+            async with spotify_breaker.guard() as outcome, session.get(
+                f"{self.BASE_URL}/search",
+                headers=self.headers,
+                params=params
+            ) as response:
+                outcome.check_status(response.status)
+                if response.status != 200:
+                    return response.status, {}
+                
+                return response.status, await response.json()
+    
+    async def get_playable_tracks(self, track_ids: List[str], market: str) -> Dict[str, Optional[str]]:
+        """
+        Проверяет, что треки существуют и доступны для прослушивания в стране
+        
+        Использует GET /tracks по SEVERAL_TRACKS_LIMIT ID за запрос вместо
+        отдельного поиска на каждый трек. Результаты кэшируются на экземпляре.
+        Если проверить батч не удалось, его треки считаются доступными -
+        проверка не должна терять треки из переноса.
+        
+        Args:
+            track_ids: Список ID треков Spotify
+            market: Код страны пользователя или "from_token"
+            
+        Returns:
+            Словарь ID трека -> ID доступного трека (может отличаться при
+            перелинковке Spotify) или None, если трек не найден или недоступен
+        """
+        result: Dict[str, Optional[str]] = {}
+        pending_ids = []
+        
+        for track_id in dict.fromkeys(track_ids):
+            cache_key = (track_id, market)
+            if settings.lookup_cache_enabled and cache_key in self._playable_cache:
+                result[track_id] = self._playable_cache[cache_key]
+            else:
+                pending_ids.append(track_id)
+        
+        if not pending_ids:
+            return result
+        
+        async with aiohttp.ClientSession(timeout=get_timeout("default")) as session:
+            for i in range(0, len(pending_ids), self.SEVERAL_TRACKS_LIMIT):
+                batch_ids = pending_ids[i:i + self.SEVERAL_TRACKS_LIMIT]
+                
+                try:
+                    async with spotify_breaker.guard() as outcome, session.get(
+                        f"{self.BASE_URL}/tracks",
+                        headers=self.headers,
+                        params={"ids": ",".join(batch_ids), "market": market}
+                    ) as response:
+                        outcome.check_status(response.status)
+                        if response.status != 200:
+                            error_text = await response.text()
+                            logger.warning(
+                                "Failed to verify tracks batch %s: %s",
+                                i // self.SEVERAL_TRACKS_LIMIT + 1, error_text
+                            )
+                            result.update({track_id: track_id for track_id in batch_ids})
+                            continue
+                        
+                        tracks_data = await response.json()
+                
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    logger.warning("Error verifying tracks batch %s: %s", i // self.SEVERAL_TRACKS_LIMIT + 1, e)
+                    result.update({track_id: track_id for track_id in batch_ids})
+                    continue
+                
+                # Ответ идёт в порядке запроса, неизвестные ID приходят как null
+                for track_id, track in zip(batch_ids, tracks_data.get("tracks", [])):
+                    if track and track.get("is_playable", True):
+                        playable_id = track.get("id")
+                    else:
+                        playable_id = None
+                    
+                    self._playable_cache[(track_id, market)] = playable_id
+                    result[track_id] = playable_id
+        
+        return result
+    
     async def create_playlist(self, user_id: str, name: str, description: str = "") -> Dict:
         """
         Создаёт новый плейлист в Spotify
@@ -204,12 +345,13 @@ class SpotifyService:
                 "public": True
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
+            async with aiohttp.ClientSession(timeout=get_timeout("default")) as session:
+                async with spotify_breaker.guard() as outcome, session.post(
                     f"{self.BASE_URL}/users/{user_id}/playlists",
                     headers=self.headers,
                     json=playlist_data
                 ) as response:
+                    outcome.check_status(response.status)
                     if response.status not in [200, 201]:
                         error_text = await response.text()
                         logger.error(f"Failed to create playlist: {error_text}")
@@ -217,6 +359,8 @@ class SpotifyService:
                     
                     return await response.json()
         
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.exception(f"Error creating playlist: {e}")
             raise
@@ -236,12 +380,13 @@ class SpotifyService:
             # Формируем список URI треков
             track_uris = [f"spotify:track:{track_id}" for track_id in track_ids]
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
+            async with aiohttp.ClientSession(timeout=get_timeout("default")) as session:
+                async with spotify_breaker.guard() as outcome, session.post(
                     f"{self.BASE_URL}/playlists/{playlist_id}/tracks",
                     headers=self.headers,
                     json={"uris": track_uris}
                 ) as response:
+                    outcome.check_status(response.status)
                     if response.status not in [200, 201]:
                         error_text = await response.text()
                         logger.error(f"Failed to add tracks to playlist: {error_text}")
@@ -249,6 +394,8 @@ class SpotifyService:
                     
                     return True
         
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.exception(f"Error adding tracks to playlist: {e}")
             return False
@@ -0,0 +1,253 @@
+"""
+Сервис переноса плейлистов из Яндекс Музыки в Spotify
+"""
+import logging
+from typing import List, Dict, Optional
+
+from services.yandex_service import YandexMusicService
+from services.spotify_service import SpotifyService
+from services.match_store import MatchStore
+from services.circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Статусы плейлистов в результате переноса
+STATUS_COMPLETED = "completed"
+STATUS_CIRCUIT_OPEN = "circuit_open"
+
+
+class TransferPausedError(Exception):
+    """Перенос прерван разомкнутой цепью: часть плейлистов уже перенесена"""
+    
+    def __init__(self, error: CircuitOpenError, results: List[Dict]):
+        """
+        Args:
+            error: Ошибка, прервавшая перенос
+            results: Результаты по всем плейлистам задачи: перенесённые со статусом
+                STATUS_COMPLETED, прерванный и оставшиеся - со статусом STATUS_CIRCUIT_OPEN
+        """
+        self.error = error
+        self.results = results
+        super().__init__(str(error))
+
+
+class TransferService:
+    """
+    Класс для переноса одного или нескольких плейлистов за одну задачу
+    
+    Экземпляры YandexMusicService и SpotifyService переиспользуются для
+    всех плейлистов задачи, поэтому uid пользователя, детальная информация
+    о треках и результаты поиска в Spotify запрашиваются один раз.
+    Найденные соответствия сохраняются в MatchStore: при повторном переносе
+    они проверяются пачками, а ищутся заново только пропавшие треки.
+    """
+    
+    # Лимит Spotify API на добавление треков за один запрос
+    ADD_TRACKS_BATCH_SIZE = 100
+    
+    LIKES_PLAYLIST_NAME = "Яндекс Музыка – Мои лайки"
+    
+    def __init__(self, yandex_service: YandexMusicService, spotify_service: SpotifyService,
+                 match_store: Optional[MatchStore] = None):
+        """
+        Инициализация сервиса
+        
+        Args:
+            yandex_service: Сервис Яндекс Музыки
+            spotify_service: Сервис Spotify
+            match_store: Хранилище соответствий между переносами
+                (по умолчанию - только в пределах задачи)
+        """
+        self.yandex_service = yandex_service
+        self.spotify_service = spotify_service
+        self.match_store = match_store or MatchStore()
+    
+    async def transfer_playlists(self, kinds: List[str]) -> List[Dict]:
+        """
+        Переносит выбранные плейлисты Яндекс Музыки в Spotify
+        
+        Для каждого непустого плейлиста создаётся отдельный плейлист в Spotify.
+        
+        Args:
+            kinds: Номера плейлистов (YandexMusicService.LIKES_KIND для 'Мне нравится')
+        
+        Returns:
+            Список результатов по каждому плейлисту:
+            [
+                {
+                    "kind": "Номер плейлиста",
+                    "title": "Название плейлиста",
+                    "status": STATUS_COMPLETED,
+                    "playlist_id": "ID плейлиста в Spotify" или None,
+                    "playlist_url": "Ссылка на плейлист" или None,
+                    "total_tracks": 10,
+                    "found_tracks": 8,
+                    "not_found_tracks": [{"artist": ..., "title": ...}, ...]
+                },
+                ...
+            ]
+        
+        Raises:
+            TransferPausedError: если цепь разомкнулась во время переноса плейлистов.
+                Результаты уже перенесённых плейлистов передаются в исключении,
+                чтобы повторный перенос не создал их заново
+        """
+        # Убираем повторы, сохраняя порядок
+        kinds = list(dict.fromkeys(kinds))
+        
+        titles = {self.yandex_service.LIKES_KIND: self.yandex_service.LIKES_TITLE}
+        if any(kind != self.yandex_service.LIKES_KIND for kind in kinds):
+            playlists = await self.yandex_service.get_playlists()
+            titles.update({playlist["kind"]: playlist["title"] for playlist in playlists})
+        
+        unknown_kinds = [kind for kind in kinds if kind not in titles]
+        if unknown_kinds:
+            raise ValueError(f"Unknown Yandex Music playlists: {', '.join(unknown_kinds)}")
+        
+        # Получаем информацию о пользователе Spotify один раз на всю задачу
+        user_info = await self.spotify_service.get_current_user()
+        user_id = user_info.get("id")
+        
+        if not user_id:
+            raise ValueError("Could not get Spotify user ID")
+        
+        # Страна пользователя для проверки доступности треков
+        market = user_info.get("country") or "from_token"
+        
+        results = [
+            {
+                "kind": kind,
+                "title": titles[kind],
+                "status": STATUS_CIRCUIT_OPEN,
+                "playlist_id": None,
+                "playlist_url": None,
+                "total_tracks": 0,
+                "found_tracks": 0,
+                "not_found_tracks": []
+            }
+            for kind in kinds
+        ]
+        
+        for result in results:
+            try:
+                await self._transfer_playlist(user_id, market, result)
+            except CircuitOpenError as e:
+                # Прерванный плейлист мог быть уже создан - его playlist_id остаётся в результате
+                raise TransferPausedError(e, results)
+            result["status"] = STATUS_COMPLETED
+        
+        return results
+    
+    async def _transfer_playlist(self, user_id: str, market: str, result: Dict) -> None:
+        """
+        Переносит один плейлист
+        
+        Args:
+            user_id: ID пользователя Spotify
+            market: Страна пользователя Spotify
+            result: Результат переноса плейлиста (см. transfer_playlists) с kind
+                и title - заполняется по ходу переноса
+        """
+        kind = result["kind"]
+        title = result["title"]
+        
+        logger.info(f"Fetching tracks of '{title}' from Yandex Music...")
+        yandex_tracks = await self.yandex_service.get_playlist_tracks(kind)
+        result["total_tracks"] = len(yandex_tracks)
+        
+        if not yandex_tracks:
+            logger.warning(f"Playlist '{title}' is empty, skipping")
+            return
+        
+        logger.info(f"Found {len(yandex_tracks)} tracks in '{title}'")
+        
+        # Ищем треки в Spotify
+        matches = []
+        # Индексы в matches соответствий из MatchStore, которые нужно проверить
+        stored = []
+        # Уровень проверяется один раз, а не на каждый трек
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        for track in yandex_tracks:
+            stored_id = None
+            # Результат поиска в этой задаче свежее сохранённого соответствия
+            if not self.spotify_service.is_search_cached(track["title"], track["artist"], market):
+                stored_id = self.match_store.get(user_id, track["title"], track["artist"])
+            
+            if stored_id:
+                stored.append(len(matches))
+                matches.append((track, stored_id))
+                continue
+            
+            # Поиск с market возвращает только треки, доступные в стране пользователя
+            spotify_track = await self.spotify_service.search_track(
+                track["title"],
+                track["artist"],
+                market=market
+            )
+            track_id = spotify_track["id"] if spotify_track else None
+            self.match_store.set(user_id, track["title"], track["artist"], track_id)
+            matches.append((track, track_id))
+        
+        # Сохранённые с прошлых переносов ID проверяем пачками: трек мог быть
+        # удалён или стать недоступен. Повторно ищем только такие треки
+        playable = await self.spotify_service.get_playable_tracks(
+            [matches[index][1] for index in stored],
+            market
+        )
+        
+        for index in stored:
+            track, stored_id = matches[index]
+            track_id = playable.get(stored_id)
+            
+            if not track_id:
+                spotify_track = await self.spotify_service.search_track(
+                    track["title"],
+                    track["artist"],
+                    market=market
+                )
+                track_id = spotify_track["id"] if spotify_track else None
+            
+            self.match_store.set(user_id, track["title"], track["artist"], track_id)
+            matches[index] = (track, track_id)
+        
+        found_tracks = []
+        
+        for track, track_id in matches:
+            if track_id:
+                found_tracks.append(track_id)
+                if debug_enabled:
+                    logger.debug("Found: %s - %s", track["artist"], track["title"], extra={"sampled": True})
+            else:
+                result["not_found_tracks"].append({
+                    "artist": track["artist"],
+                    "title": track["title"]
+                })
+                if debug_enabled:
+                    logger.debug("Not found: %s - %s", track["artist"], track["title"], extra={"sampled": True})
+        
+        result["found_tracks"] = len(found_tracks)
+        
+        # Плейлист создаётся после поиска: если цепь Spotify разомкнётся во время
+        # поиска, у пользователя не останется пустого плейлиста
+        if kind == self.yandex_service.LIKES_KIND:
+            playlist_name = self.LIKES_PLAYLIST_NAME
+        else:
+            playlist_name = f"Яндекс Музыка – {title}"
+        
+        playlist = await self.spotify_service.create_playlist(user_id, playlist_name)
+        playlist_id = playlist.get("id")
+        
+        if not playlist_id:
+            raise Exception(f"Failed to create Spotify playlist for '{title}'")
+        
+        result["playlist_id"] = playlist_id
+        result["playlist_url"] = playlist.get("external_urls", {}).get("spotify")
+        
+        logger.info(f"Created playlist: {playlist_id}")
+        
+        # Добавляем найденные треки в плейлист
+        for i in range(0, len(found_tracks), self.ADD_TRACKS_BATCH_SIZE):
+            batch = found_tracks[i:i + self.ADD_TRACKS_BATCH_SIZE]
+            await self.spotify_service.add_tracks_to_playlist(playlist_id, batch)
+            logger.info(f"Added {len(batch)} tracks to playlist (batch {i // self.ADD_TRACKS_BATCH_SIZE + 1})")
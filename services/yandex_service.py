@@ -5,13 +5,21 @@ import logging
 from typing import List, Dict, Optional
 import aiohttp
 
+from config import settings
+from services.http_utils import get_timeout
+from services.circuit_breaker import CircuitOpenError, yandex_breaker
+
 logger = logging.getLogger(__name__)
 
 
 class YandexMusicService:
     """Класс для взаимодействия с Yandex Music API"""
     
-    BASE_URL = "https://api.music.yandex.net"
+    BASE_URL = settings.yandex_api_url
+    
+    # Условный идентификатор плейлиста 'Мне нравится'
+    LIKES_KIND = "likes"
+    LIKES_TITLE = "Мне нравится"
     
     def __init__(self, token: str):
         """
@@ -25,6 +33,102 @@ class YandexMusicService:
             "Authorization": f"OAuth {token}",
             "Content-Type": "application/json"
         }
+        # Кэши, общие для всех плейлистов одного переноса
+        self._user_id: Optional[str] = None
+        self._track_cache: Dict[str, Dict[str, str]] = {}
+    
+    async def get_user_id(self, session: aiohttp.ClientSession) -> str:
+        """
+        Получает uid пользователя Яндекс Музыки
+        
+        Результат кэшируется на экземпляре сервиса, поэтому при переносе
+        нескольких плейлистов запрос к /account/status выполняется один раз.
+        
+        Args:
+            session: Открытая aiohttp сессия
+            
+        Returns:
+            uid пользователя
+        """
+        if self._user_id:
+            return self._user_id
+        
+        async with yandex_breaker.guard() as outcome, session.get(
+            f"{self.BASE_URL}/account/status",
+            headers=self.headers
+        ) as response:
+            outcome.check_status(response.status)
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Yandex account status failed: {error_text}")
+                raise Exception(f"Failed to get account status: {response.status}")
+            
+            account_data = await response.json()
+            user_id = account_data.get("result", {}).get("account", {}).get("uid")
+            
+            if not user_id:
+                raise Exception("Could not get user ID from Yandex Music")
+        
+        self._user_id = str(user_id)
+        return self._user_id
+    
+    async def get_playlists(self) -> List[Dict]:
+        """
+        Получает список плейлистов пользователя
+        
+        Returns:
+            Список словарей с информацией о плейлистах, первым идёт
+            'Мне нравится':
+            [
+                {
+                    "kind": "likes" или номер плейлиста,
+                    "title": "Название плейлиста",
+                    "track_count": 42
+                },
+                ...
+            ]
+        """
+        try:
+            async with aiohttp.ClientSession(timeout=get_timeout("default")) as session:
+                user_id = await self.get_user_id(session)
+                
+                async with yandex_breaker.guard() as outcome, session.get(
+                    f"{self.BASE_URL}/users/{user_id}/playlists/list",
+                    headers=self.headers
+                ) as response:
+                    outcome.check_status(response.status)
+                    if response.status != 200:
+                        error_text = await response.text()
+                        logger.error(f"Yandex playlists list failed: {error_text}")
+                        raise Exception(f"Failed to get playlists: {response.status}")
+                    
+                    playlists_data = await response.json()
+            
+            playlists = [{
+                "kind": self.LIKES_KIND,
+                "title": self.LIKES_TITLE,
+                "track_count": None
+            }]
+            
+            for playlist in playlists_data.get("result", []) or []:
+                kind = playlist.get("kind")
+                if kind is None:
+                    continue
+                
+                playlists.append({
+                    "kind": str(kind),
+                    "title": playlist.get("title", ""),
+                    "track_count": playlist.get("trackCount")
+                })
+            
+            logger.info(f"Found {len(playlists) - 1} playlists in Yandex Music")
+            return playlists
+        
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.exception(f"Error getting playlists from Yandex: {e}")
+            raise
     
     async def get_liked_tracks(self) -> List[Dict[str, str]]:
         """
@@ -34,6 +138,7 @@ class YandexMusicService:
             Список словарей с информацией о треках:
             [
                 {
+                    "id": "ID трека в Яндекс Музыке",
                     "title": "Название трека",
                     "artist": "Исполнитель",
                     "album": "Альбом" (опционально)
@@ -41,118 +146,184 @@ class YandexMusicService:
                 ...
             ]
         """
-        tracks = []
+        return await self.get_playlist_tracks(self.LIKES_KIND)
+    
+    async def get_playlist_tracks(self, kind: str) -> List[Dict[str, str]]:
+        """
+        Получает все треки плейлиста
+        
+        Детальная информация о треках кэшируется на экземпляре сервиса:
+        трек, который встречается в нескольких плейлистах, запрашивается
+        у /tracks только один раз (если включён settings.lookup_cache_enabled).
+        
+        Args:
+            kind: Номер плейлиста или LIKES_KIND для 'Мне нравится'
+            
+        Returns:
+            Список словарей с информацией о треках (см. get_liked_tracks)
+        """
+        if not settings.lookup_cache_enabled:
+            # Без кэша информация о треках каждого плейлиста запрашивается заново
+            self._track_cache.clear()
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Получаем информацию о пользователе
-                async with session.get(
-                    f"{self.BASE_URL}/account/status",
-                    headers=self.headers
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Yandex account status failed: {error_text}")
-                        raise Exception(f"Failed to get account status: {response.status}")
-                    
-                    account_data = await response.json()
-                    user_id = account_data.get("result", {}).get("account", {}).get("uid")
-                    
-                    if not user_id:
-                        raise Exception("Could not get user ID from Yandex Music")
+            async with aiohttp.ClientSession(timeout=get_timeout("default")) as session:
+                user_id = await self.get_user_id(session)
                 
-                # Получаем плейлист "Мне нравится"
-                # Используем endpoint для получения лайкнутых треков
-                async with session.get(
-                    f"{self.BASE_URL}/users/{user_id}/likes/tracks",
-                    headers=self.headers
-                ) as response:
+                if kind == self.LIKES_KIND:
+                    # Используем endpoint для получения лайкнутых треков
+                    url = f"{self.BASE_URL}/users/{user_id}/likes/tracks"
+                else:
+                    url = f"{self.BASE_URL}/users/{user_id}/playlists/{kind}"
+                
+                async with yandex_breaker.guard() as outcome, session.get(url, headers=self.headers) as response:
+                    outcome.check_status(response.status)
                     if response.status != 200:
                         error_text = await response.text()
-                        logger.error(f"Yandex likes tracks failed: {error_text}")
-                        raise Exception(f"Failed to get liked tracks: {response.status}")
+                        logger.error(f"Yandex playlist {kind} tracks failed: {error_text}")
+                        raise Exception(f"Failed to get playlist tracks: {response.status}")
                     
-                    likes_data = await response.json()
+                    playlist_data = await response.json()
                     
                     # Пытаемся получить треки из разных возможных структур ответа
-                    result = likes_data.get("result", {})
-                    liked_tracks = (
+                    result = playlist_data.get("result", {})
+                    playlist_tracks = (
                         result.get("library", {}).get("tracks", []) or
                         result.get("tracks", []) or
                         []
                     )
                     
-                    logger.info(f"Found {len(liked_tracks)} liked tracks")
+                    logger.info(f"Found {len(playlist_tracks)} tracks in playlist {kind}")
                 
-                if not liked_tracks:
-                    logger.warning("No liked tracks found in Yandex Music")
+                if not playlist_tracks:
+                    logger.warning(f"No tracks found in Yandex Music playlist {kind}")
                     return []
                 
-                # Получаем детальную информацию о каждом треке
-                # Yandex API возвращает ID треков, нужно получить полную информацию
+                # Yandex API возвращает ID треков, нужно получить полную информацию.
+                # Плейлисты иногда сразу содержат полную информацию о треке -
+                # её кладём в кэш, чтобы не запрашивать повторно
                 track_ids = []
-                for track in liked_tracks:
+                for track in playlist_tracks:
                     track_id = track.get("id") or track.get("trackId")
-                    if track_id:
-                        track_ids.append(track_id)
+                    if not track_id:
+                        continue
+                    
+                    track_id = str(track_id)
+                    track_ids.append(track_id)
+                    
+                    track_info = track.get("track")
+                    if track_info and track_id not in self._track_cache:
+                        self._track_cache[track_id] = self._parse_track(track_id, track_info)
                 
                 if not track_ids:
                     logger.warning("No track IDs found")
                     return []
                 
-                # Получаем информацию о треках батчами (лимит Yandex API - обычно 100)
-                batch_size = 100
-                for i in range(0, len(track_ids), batch_size):
-                    batch_ids = track_ids[i:i + batch_size]
-                    
-                    try:
-                        # Формируем запрос для получения информации о треках
-                        async with session.post(
-                            f"{self.BASE_URL}/tracks",
-                            headers=self.headers,
-                            json={"track-ids": batch_ids}
-                        ) as response:
-                            if response.status != 200:
-                                error_text = await response.text()
-                                logger.warning(f"Failed to get track details for batch {i//batch_size + 1}: {error_text}")
-                                continue
-                            
-                            tracks_data = await response.json()
-                            tracks_list = tracks_data.get("result", [])
-                            
-                            if not tracks_list:
-                                logger.warning(f"No tracks in response for batch {i//batch_size + 1}")
-                                continue
-                            
-                            for track_info in tracks_list:
-                                if not track_info:
-                                    continue
-                                    
-                                title = track_info.get("title", "")
-                                artists = track_info.get("artists", [])
-                                artist_names = [artist.get("name", "") for artist in artists if artist]
-                                artist = ", ".join(artist_names) if artist_names else "Unknown Artist"
-                                
-                                albums = track_info.get("albums", [])
-                                album = albums[0].get("title", "") if albums and albums[0] else ""
-                                
-                                tracks.append({
-                                    "title": title,
-                                    "artist": artist,
-                                    "album": album
-                                })
-                    
-                    except Exception as e:
-                        logger.error(f"Error processing batch {i//batch_size + 1}: {e}")
-                        continue
+                await self._fetch_track_details(session, track_ids)
+                
+                tracks = [self._track_cache[track_id] for track_id in track_ids if track_id in self._track_cache]
                 
                 logger.info(f"Processed {len(tracks)} tracks from Yandex Music")
                 return tracks
         
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            logger.exception(f"Error getting liked tracks from Yandex: {e}")
+            logger.exception(f"Error getting tracks of playlist {kind} from Yandex: {e}")
             raise
     
+    async def _fetch_track_details(self, session: aiohttp.ClientSession, track_ids: List[str]) -> None:
+        """
+        Загружает в кэш детальную информацию о треках, которых там ещё нет
+        
+        Args:
+            session: Открытая aiohttp сессия
+            track_ids: Список ID треков
+        """
+        missing_ids = list(dict.fromkeys(
+            track_id for track_id in track_ids if track_id not in self._track_cache
+        ))
+        
+        if not missing_ids:
+            return
+        
+        # Получаем информацию о треках батчами (лимит Yandex API - обычно 100)
+        batch_size = 100
+        for i in range(0, len(missing_ids), batch_size):
+            batch_ids = missing_ids[i:i + batch_size]
+            
+            try:
+                # Формируем запрос для получения информации о треках
+                async with yandex_breaker.guard() as outcome, session.post(
+                    f"{self.BASE_URL}/tracks",
+                    headers=self.headers,
+                    json={"track-ids": batch_ids},
+                    timeout=get_timeout("tracks")
+                ) as response:
+                    outcome.check_status(response.status)
+                    if response.status != 200:
+                        error_text = await response.text()
+                        logger.warning(f"Failed to get track details for batch {i//batch_size + 1}: {error_text}")
+                        continue
+                    
+                    tracks_data = await response.json()
+                    tracks_list = tracks_data.get("result", [])
+                    
+                    if not tracks_list:
+                        logger.warning(f"No tracks in response for batch {i//batch_size + 1}")
+                        continue
+                    
+                    # В ответе ID трека приходит без albumId ("123", а не "123:456")
+                    requested_ids = {track_id.split(":")[0]: track_id for track_id in batch_ids}
+                    
+                    # Если ответ полный, он идёт в порядке запроса - это запасной вариант
+                    # для треков, которые Яндекс вернул под другим ID
+                    same_order = len(tracks_list) == len(batch_ids)
+                    
+                    for index, track_info in enumerate(tracks_list):
+                        if not track_info:
+                            continue
+                        
+                        track_id = requested_ids.get(str(track_info.get("id", "")))
+                        if not track_id and same_order:
+                            track_id = batch_ids[index]
+                        if track_id:
+                            self._track_cache[track_id] = self._parse_track(track_id, track_info)
+            
+            except CircuitOpenError:
+                # Цепь разомкнута - прерываем перенос, а не пропускаем батч
+                raise
+            except Exception as e:
+                logger.error(f"Error processing batch {i//batch_size + 1}: {e}")
+                continue
+    
+    @staticmethod
+    def _parse_track(track_id: str, track_info: Dict) -> Dict[str, str]:
+        """
+        Приводит ответ Yandex API о треке к общему формату
+        
+        Args:
+            track_id: ID трека
+            track_info: Информация о треке из Yandex API
+            
+        Returns:
+            Словарь с id, title, artist и album
+        """
+        title = track_info.get("title", "")
+        artists = track_info.get("artists", [])
+        artist_names = [artist.get("name", "") for artist in artists if artist]
+        artist = ", ".join(artist_names) if artist_names else "Unknown Artist"
+        
+        albums = track_info.get("albums", [])
+        album = albums[0].get("title", "") if albums and albums[0] else ""
+        
+        return {
+            "id": track_id,
+            "title": title,
+            "artist": artist,
+            "album": album
+        }
+    
     async def validate_token(self) -> bool:
         """
         Проверяет валидность токена Яндекс Музыки
@@ -161,7 +332,7 @@ class YandexMusicService:
             True если токен валидный, False иначе
         """
         try:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(timeout=get_timeout("auth")) as session:
                 async with session.get(
                     f"{self.BASE_URL}/account/status",
                     headers=self.headers
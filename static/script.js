@@ -83,6 +83,87 @@ function getErrorMessage(errorCode) {
     return errors[errorCode] || 'Произошла неизвестная ошибка.';
 }
 
+/**
+ * Загружает список плейлистов Яндекс Музыки
+ */
+async function loadPlaylists() {
+    const yandexToken = document.getElementById('yandex-token').value.trim();
+    if (!yandexToken) {
+        showMessage('Пожалуйста, вставьте токен Яндекс Музыки', 'error');
+        document.getElementById('yandex-token').focus();
+        return;
+    }
+    
+    const loadBtn = document.getElementById('load-playlists-btn');
+    loadBtn.disabled = true;
+    
+    try {
+        const formData = new FormData();
+        formData.append('yandex_token', yandexToken);
+        
+        const response = await fetch('/yandex/playlists', {
+            method: 'POST',
+            body: formData
+        });
+        
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({ detail: 'Неизвестная ошибка' }));
+            throw new Error(errorData.detail || `Ошибка ${response.status}`);
+        }
+        
+        const result = await response.json();
+        const playlistsList = document.getElementById('playlists-list');
+        playlistsList.innerHTML = '';
+        
+        result.playlists.forEach((playlist, index) => {
+            const li = document.createElement('li');
+            const label = document.createElement('label');
+            const checkbox = document.createElement('input');
+            checkbox.type = 'checkbox';
+            checkbox.value = playlist.kind;
+            checkbox.checked = index === 0;
+            label.appendChild(checkbox);
+            
+            const count = playlist.track_count !== null ? ` (${playlist.track_count})` : '';
+            label.appendChild(document.createTextNode(` ${playlist.title}${count}`));
+            li.appendChild(label);
+            playlistsList.appendChild(li);
+        });
+        
+        document.getElementById('playlists-container').classList.remove('hidden');
+        
+    } catch (error) {
+        console.error('Playlists error:', error);
+        showMessage(`Ошибка при загрузке плейлистов: ${error.message}`, 'error');
+    } finally {
+        loadBtn.disabled = false;
+    }
+}
+
+/**
+ * Возвращает номера отмеченных плейлистов
+ */
+function getSelectedPlaylists() {
+    const checkboxes = document.querySelectorAll('#playlists-list input[type="checkbox"]:checked');
+    return Array.from(checkboxes).map(checkbox => checkbox.value);
+}
+
+/**
+ * Снимает отметку с уже перенесённых плейлистов и возвращает их названия
+ */
+function markTransferredPlaylists(playlists) {
+    const transferred = playlists.filter(playlist => playlist.status === 'completed');
+    
+    transferred.forEach(playlist => {
+        const checkbox = document.querySelector(`#playlists-list input[value="${playlist.kind}"]`);
+        if (checkbox) {
+            checkbox.checked = false;
+        }
+    });
+    
+    return transferred.map(playlist => playlist.title);
+}
+
 /**
  * Перенос плейлиста
  */
@@ -120,6 +201,11 @@ async function transferPlaylist() {
         formData.append('yandex_token', yandexToken);
         formData.append('session_id', sessionId);
         
+        const selectedPlaylists = getSelectedPlaylists();
+        if (selectedPlaylists.length > 0) {
+            formData.append('playlists', selectedPlaylists.join(','));
+        }
+        
         updateProgress(10, 'Получение треков из Яндекс Музыки...');
         
         const response = await fetch('/transfer', {
@@ -129,7 +215,17 @@ async function transferPlaylist() {
         
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({ detail: 'Неизвестная ошибка' }));
-            throw new Error(errorData.detail || `Ошибка ${response.status}`);
+            let message = errorData.detail || `Ошибка ${response.status}`;
+            
+            // Перенос прерван: часть плейлистов уже перенесена
+            if (errorData.playlists) {
+                const transferred = markTransferredPlaylists(errorData.playlists);
+                if (transferred.length > 0) {
+                    message += `. Уже перенесены: ${transferred.join(', ')}. ` +
+                        'Повторите перенос позже - будут перенесены только оставшиеся плейлисты';
+                }
+            }
+            throw new Error(message);
         }
         
         updateProgress(50, 'Поиск треков в Spotify...');
@@ -184,6 +280,27 @@ function showResults(result) {
     playlistLink.href = result.playlist_url;
     playlistLink.textContent = result.playlist_url;
     
+    // Ссылки на все созданные плейлисты, если их несколько
+    const playlistLinks = document.getElementById('playlist-links');
+    const created = (result.playlists || []).filter(playlist => playlist.playlist_url);
+    playlistLinks.innerHTML = '';
+    
+    if (created.length > 1) {
+        playlistLinks.classList.remove('hidden');
+        
+        created.forEach(playlist => {
+            const li = document.createElement('li');
+            const a = document.createElement('a');
+            a.href = playlist.playlist_url;
+            a.target = '_blank';
+            a.textContent = `${playlist.title}: ${playlist.found_tracks} из ${playlist.total_tracks}`;
+            li.appendChild(a);
+            playlistLinks.appendChild(li);
+        });
+    } else {
+        playlistLinks.classList.add('hidden');
+    }
+    
     // Статистика
     document.getElementById('total-tracks').textContent = result.total_tracks;
     document.getElementById('found-tracks').textContent = result.found_tracks;
@@ -0,0 +1,135 @@
+"""
+Тесты circuit breaker
+"""
+import asyncio
+
+import aiohttp
+import pytest
+
+from config import settings
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Breaker с маленьким окном: размыкается после 4 запросов с 50% ошибок"""
+    monkeypatch.setattr(settings, "circuit_window_size", 4)
+    monkeypatch.setattr(settings, "circuit_min_calls", 4)
+    monkeypatch.setattr(settings, "circuit_error_rate_threshold", 0.5)
+    monkeypatch.setattr(settings, "circuit_slow_rate_threshold", 0.5)
+    monkeypatch.setattr(settings, "circuit_slow_call_threshold", 1.0)
+    monkeypatch.setattr(settings, "circuit_open_timeout", 30.0)
+    monkeypatch.setattr(settings, "circuit_half_open_max_calls", 2)
+    return CircuitBreaker("test")
+
+
+def trip(breaker):
+    """Размыкает цепь ошибками"""
+    for _ in range(settings.circuit_min_calls):
+        breaker.before_call()
+        breaker.record(failed=True, duration=0.0)
+
+
+def expire_open_timeout(breaker):
+    """Переводит время так, будто circuit_open_timeout истёк"""
+    breaker._opened_at -= settings.circuit_open_timeout
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(settings.circuit_min_calls - 1):
+        breaker.before_call()
+        breaker.record(failed=True, duration=0.0)
+    
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_opens_on_error_rate(breaker):
+    for failed in (False, True, False, True):
+        breaker.before_call()
+        breaker.record(failed=failed, duration=0.0)
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.upstream == "test"
+    assert error.value.retry_after > 0
+
+
+def test_opens_on_slow_rate(breaker):
+    for duration in (2.0, 0.1, 2.0, 0.1):
+        breaker.before_call()
+        breaker.record(failed=False, duration=duration)
+    
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_after_timeout_and_closes_on_successes(breaker):
+    trip(breaker)
+    expire_open_timeout(breaker)
+    
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    # Пробных запросов уже circuit_half_open_max_calls
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    breaker.record(failed=False, duration=0.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(failed=False, duration=0.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.status()["calls"] == 0
+
+
+def test_failed_probe_reopens(breaker):
+    trip(breaker)
+    expire_open_timeout(breaker)
+    
+    breaker.before_call()
+    breaker.record(failed=True, duration=0.0)
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() > 0
+
+
+def test_guard_counts_transport_errors_and_status(breaker):
+    async def scenario():
+        with pytest.raises(aiohttp.ClientConnectionError):
+            async with breaker.guard():
+                raise aiohttp.ClientConnectionError()
+        
+        async with breaker.guard() as outcome:
+            outcome.check_status(503)
+        
+        # Не-сетевое исключение (например, обработка 401) ошибкой не считается
+        with pytest.raises(ValueError):
+            async with breaker.guard() as outcome:
+                outcome.check_status(401)
+                raise ValueError("unauthorized")
+    
+    asyncio.run(scenario())
+    
+    assert list(breaker._window) == [(True, False), (True, False), (False, False)]
+
+
+def test_guard_releases_half_open_slot_on_cancel(breaker):
+    trip(breaker)
+    expire_open_timeout(breaker)
+    
+    async def probe():
+        async with breaker.guard():
+            await asyncio.sleep(10)
+    
+    async def scenario():
+        task = asyncio.ensure_future(probe())
+        await asyncio.sleep(0)
+        assert breaker._half_open_in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(scenario())
+    
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker._half_open_in_flight == 0
+    assert breaker._half_open_successes == 0
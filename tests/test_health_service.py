@@ -0,0 +1,25 @@
+"""
+Тесты readiness
+"""
+from config import settings
+from services.health_service import HealthMonitor
+
+
+def test_unreachable_upstream_does_not_fail_readiness():
+    monitor = HealthMonitor()
+    monitor._upstreams["spotify"]["reachable"] = False
+    
+    readiness = monitor.readiness(sessions=0)
+    
+    assert readiness["ready"]
+    assert readiness["upstreams"]["spotify"]["reachable"] is False
+
+
+def test_overload_fails_readiness():
+    monitor = HealthMonitor()
+    monitor.queued_transfers = settings.readiness_max_queue + 1
+    
+    readiness = monitor.readiness(sessions=settings.readiness_max_sessions + 1)
+    
+    assert not readiness["ready"]
+    assert readiness["reasons"] == ["transfer_queue_full", "too_many_sessions"]
@@ -0,0 +1,145 @@
+"""
+Тесты хеджирования запросов и учёта задержек
+"""
+import asyncio
+
+import pytest
+
+from config import settings
+from services import http_utils
+from services.http_utils import LatencyTracker, hedged_call
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    """Свежий трекер с накопленными замерами по 10мс и включённым хеджированием"""
+    tracker = LatencyTracker()
+    for _ in range(LatencyTracker.MIN_SAMPLES):
+        tracker.record("test", 0.01)
+    for _ in range(LatencyTracker.MIN_SAMPLES):
+        tracker.count_request("test")
+    
+    monkeypatch.setattr(http_utils, "latency_tracker", tracker)
+    monkeypatch.setattr(settings, "search_hedging_enabled", True)
+    monkeypatch.setattr(settings, "search_hedge_min_delay", 0.02)
+    monkeypatch.setattr(settings, "search_hedge_budget", 0.5)
+    return tracker
+
+
+class FakeUpstream:
+    """Запросы с заданными задержками и ошибками по номеру попытки"""
+    
+    def __init__(self, delays, errors=None):
+        self.delays = delays
+        self.errors = errors or {}
+        self.calls = 0
+        self.cancelled = []
+    
+    async def call(self):
+        attempt = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[attempt])
+        except asyncio.CancelledError:
+            self.cancelled.append(attempt)
+            raise
+        if attempt in self.errors:
+            raise self.errors[attempt]
+        return attempt
+
+
+def test_no_hedge_without_enough_samples(monkeypatch):
+    monkeypatch.setattr(http_utils, "latency_tracker", LatencyTracker())
+    monkeypatch.setattr(settings, "search_hedging_enabled", True)
+    upstream = FakeUpstream([0.05])
+    
+    assert asyncio.run(hedged_call("test", upstream.call)) == 0
+    assert upstream.calls == 1
+
+
+def test_fast_primary_is_not_hedged(tracker):
+    upstream = FakeUpstream([0.0])
+    
+    assert asyncio.run(hedged_call("test", upstream.call)) == 0
+    assert upstream.calls == 1
+
+
+def test_first_answer_wins_and_loser_is_cancelled(tracker):
+    upstream = FakeUpstream([1.0, 0.0])
+    
+    assert asyncio.run(hedged_call("test", upstream.call)) == 1
+    assert upstream.cancelled == [0]
+    assert tracker.stats()["test"]["hedges"] == 1
+
+
+def test_cancelled_primary_latency_is_recorded(tracker):
+    upstream = FakeUpstream([1.0, 0.0])
+    
+    asyncio.run(hedged_call("test", upstream.call))
+    
+    # Отменённый запрос длился не меньше порога хеджирования
+    assert max(tracker._samples["test"]) >= settings.search_hedge_min_delay
+
+
+def test_no_hedge_when_budget_is_exhausted(tracker, monkeypatch):
+    monkeypatch.setattr(settings, "search_hedge_budget", 0.0)
+    upstream = FakeUpstream([0.1])
+    
+    assert asyncio.run(hedged_call("test", upstream.call)) == 0
+    assert upstream.calls == 1
+
+
+def test_failed_primary_falls_back_to_hedge(tracker):
+    upstream = FakeUpstream([0.05, 0.1], errors={0: RuntimeError("primary")})
+    
+    assert asyncio.run(hedged_call("test", upstream.call)) == 1
+
+
+def test_error_is_raised_when_all_attempts_fail(tracker):
+    upstream = FakeUpstream([0.05, 0.1], errors={0: RuntimeError("primary"), 1: RuntimeError("hedge")})
+    
+    with pytest.raises(RuntimeError, match="primary"):
+        asyncio.run(hedged_call("test", upstream.call))
+
+
+def test_hedge_budget_uses_sliding_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_utils.time, "monotonic", lambda: now[0])
+    tracker = LatencyTracker()
+    
+    for _ in range(100):
+        tracker.count_request("test")
+    
+    # Запас, накопленный 100 запросами, после окна не используется
+    now[0] += LatencyTracker.HEDGE_WINDOW + 1
+    for _ in range(10):
+        tracker.count_request("test")
+    
+    assert tracker.try_acquire_hedge("test", 0.1)
+    assert not tracker.try_acquire_hedge("test", 0.1)
+
+
+def test_request_window_is_trimmed_without_hedging(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_utils.time, "monotonic", lambda: now[0])
+    tracker = LatencyTracker()
+    
+    for _ in range(1000):
+        tracker.count_request("test")
+        now[0] += 0.1
+    
+    # В окне остаются только запросы за последние HEDGE_WINDOW секунд
+    assert len(tracker._recent_requests["test"]) <= LatencyTracker.HEDGE_WINDOW / 0.1 + 1
+    assert tracker.stats()["test"]["requests"] == 1000
+
+
+def test_percentile_is_not_computed_when_hedging_is_off(tracker, monkeypatch):
+    monkeypatch.setattr(settings, "search_hedging_enabled", False)
+    
+    def fail(*args):
+        raise AssertionError("percentile computed")
+    
+    monkeypatch.setattr(tracker, "percentile", fail)
+    upstream = FakeUpstream([0.0])
+    
+    assert asyncio.run(hedged_call("test", upstream.call)) == 0
@@ -0,0 +1,47 @@
+"""
+Тесты фильтра и обработчика логов
+"""
+import logging
+import queue
+
+from logging_config import LoopQueueHandler, TrackLogSampler
+
+
+def make_record(sampled: bool) -> logging.LogRecord:
+    """Создаёт запись, помеченную или не помеченную для сэмплирования"""
+    record = logging.LogRecord("test", logging.DEBUG, __file__, 1, "Found: %s", ("track",), None)
+    if sampled:
+        record.sampled = True
+    return record
+
+
+def test_sampler_keeps_every_nth_sampled_record():
+    sampler = TrackLogSampler(0.25)
+    
+    kept = [sampler.filter(make_record(sampled=True)) for _ in range(8)]
+    
+    assert kept == [True, False, False, False, True, False, False, False]
+
+
+def test_sampler_passes_unsampled_records():
+    sampler = TrackLogSampler(0.0)
+    
+    assert sampler.filter(make_record(sampled=False))
+    assert not sampler.filter(make_record(sampled=True))
+
+
+def test_sampler_keeps_all_at_full_rate():
+    sampler = TrackLogSampler(1.0)
+    
+    assert all(sampler.filter(make_record(sampled=True)) for _ in range(5))
+
+
+def test_queue_handler_drops_records_when_full():
+    handler = LoopQueueHandler(queue.Queue(maxsize=1))
+    
+    handler.handle(make_record(sampled=False))
+    handler.handle(make_record(sampled=False))
+    
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "Found: track"
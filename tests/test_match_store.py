@@ -0,0 +1,45 @@
+"""
+Тесты хранилища соответствий
+"""
+from config import settings
+from services.match_store import MatchStore
+
+
+def test_matches_are_stored_per_user_and_normalized():
+    store = MatchStore()
+    
+    store.set("u1", "Song ", "Artist", "id1")
+    
+    assert store.get("u1", "song", "ARTIST") == "id1"
+    assert store.get("u2", "song", "artist") is None
+
+
+def test_none_removes_match():
+    store = MatchStore()
+    store.set("u1", "song", "artist", "id1")
+    
+    store.set("u1", "song", "artist", None)
+    
+    assert store.get("u1", "song", "artist") is None
+
+
+def test_least_recently_used_users_are_evicted(monkeypatch):
+    monkeypatch.setattr(settings, "match_store_max_users", 2)
+    store = MatchStore()
+    store.set("u1", "song", "artist", "id1")
+    store.set("u2", "song", "artist", "id2")
+    store.get("u1", "song", "artist")
+    
+    store.set("u3", "song", "artist", "id3")
+    
+    assert store.get("u1", "song", "artist") == "id1"
+    assert store.get("u2", "song", "artist") is None
+
+
+def test_store_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "match_store_max_users", 0)
+    store = MatchStore()
+    
+    store.set("u1", "song", "artist", "id1")
+    
+    assert store.get("u1", "song", "artist") is None
@@ -0,0 +1,102 @@
+"""
+Тесты проверки доступности треков Spotify
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from config import settings
+from services import spotify_service
+from services.circuit_breaker import CircuitBreaker
+from services.spotify_service import SpotifyService
+
+
+class FakeTracksApi:
+    """GET /tracks: "gone" - null, "blocked" - недоступен, "old<n>" перелинкован в "new<n>" """
+    
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.requests = []
+    
+    async def tracks(self, request: web.Request) -> web.Response:
+        ids = request.query["ids"].split(",")
+        self.requests.append((ids, request.query.get("market")))
+        if self.status != 200:
+            return web.Response(status=self.status, text="error")
+        
+        tracks = []
+        for track_id in ids:
+            if track_id == "gone":
+                tracks.append(None)
+            elif track_id == "blocked":
+                tracks.append({"id": track_id, "is_playable": False})
+            else:
+                tracks.append({"id": track_id.replace("old", "new"), "is_playable": True})
+        return web.json_response({"tracks": tracks})
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    """Отдельный breaker, чтобы тесты не влияли друг на друга"""
+    monkeypatch.setattr(spotify_service, "spotify_breaker", CircuitBreaker("spotify"))
+
+
+def check_playable(api: FakeTracksApi, calls):
+    """Запускает стаб и выполняет get_playable_tracks для каждого набора ID"""
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/tracks", api.tracks)
+        async with TestServer(app) as server:
+            service = SpotifyService("token")
+            service.BASE_URL = str(server.make_url("")).rstrip("/")
+            return [await service.get_playable_tracks(track_ids, "RU") for track_ids in calls]
+    
+    return asyncio.run(scenario())
+
+
+def test_batches_ids_by_limit():
+    api = FakeTracksApi()
+    track_ids = [f"id{n}" for n in range(SpotifyService.SEVERAL_TRACKS_LIMIT * 2 + 1)]
+    
+    [result] = check_playable(api, [track_ids])
+    
+    assert [len(ids) for ids, _ in api.requests] == [SpotifyService.SEVERAL_TRACKS_LIMIT] * 2 + [1]
+    assert all(market == "RU" for _, market in api.requests)
+    assert result == {track_id: track_id for track_id in track_ids}
+
+
+def test_relinked_unplayable_and_missing_tracks():
+    api = FakeTracksApi()
+    
+    [result] = check_playable(api, [["old1", "blocked", "gone", "ok"]])
+    
+    assert result == {"old1": "new1", "blocked": None, "gone": None, "ok": "ok"}
+
+
+def test_results_are_cached_and_ids_deduplicated():
+    api = FakeTracksApi()
+    
+    _, second = check_playable(api, [["a", "a", "b"], ["b", "c"]])
+    
+    assert api.requests[0][0] == ["a", "b"]
+    assert api.requests[1][0] == ["c"]
+    assert second == {"b": "b", "c": "c"}
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "lookup_cache_enabled", False)
+    api = FakeTracksApi()
+    
+    check_playable(api, [["a"], ["a"]])
+    
+    assert [ids for ids, _ in api.requests] == [["a"], ["a"]]
+
+
+def test_failed_batch_keeps_tracks():
+    api = FakeTracksApi(status=500)
+    
+    [result] = check_playable(api, [["a", "b"]])
+    
+    assert result == {"a": "a", "b": "b"}
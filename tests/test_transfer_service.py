@@ -0,0 +1,156 @@
+"""
+Тесты переноса плейлистов на поддельных сервисах
+"""
+import asyncio
+
+import pytest
+
+from services.circuit_breaker import CircuitOpenError
+from services.match_store import MatchStore
+from services.transfer_service import STATUS_CIRCUIT_OPEN, STATUS_COMPLETED, TransferPausedError, TransferService
+
+
+class FakeYandex:
+    """Плейлисты: kind -> список (исполнитель, название)"""
+    
+    LIKES_KIND = "likes"
+    LIKES_TITLE = "Мне нравится"
+    
+    def __init__(self, playlists):
+        self.playlists = playlists
+    
+    async def get_playlists(self):
+        return [{"kind": kind, "title": f"Playlist {kind}"} for kind in self.playlists if kind != self.LIKES_KIND]
+    
+    async def get_playlist_tracks(self, kind):
+        return [{"artist": artist, "title": title} for artist, title in self.playlists[kind]]
+
+
+class FakeSpotify:
+    """
+    Находит трек с ID ids.get(название, название), если название не начинается с "missing".
+    Один экземпляр - одна задача переноса
+    """
+    
+    def __init__(self, unplayable=(), ids=None, open_after=None):
+        self.unplayable = set(unplayable)
+        self.ids = ids or {}
+        self.open_after = open_after
+        self.searches = []
+        self.verified = []
+        self.created = []
+        self.added = {}
+        self._cache = {}
+    
+    async def get_current_user(self):
+        return {"id": "user", "country": "RU"}
+    
+    def is_search_cached(self, title, artist, market=None):
+        return (title, artist, market) in self._cache
+    
+    async def search_track(self, title, artist, market=None):
+        if self.open_after is not None and len(self.searches) >= self.open_after:
+            raise CircuitOpenError("spotify", 30.0)
+        if (title, artist, market) not in self._cache:
+            self.searches.append((title, market))
+            self._cache[(title, artist, market)] = (
+                None if title.startswith("missing") else {"id": self.ids.get(title, title)}
+            )
+        return self._cache[(title, artist, market)]
+    
+    async def get_playable_tracks(self, track_ids, market):
+        self.verified.append(list(track_ids))
+        return {track_id: None if track_id in self.unplayable else track_id for track_id in track_ids}
+    
+    async def create_playlist(self, user_id, name):
+        playlist_id = f"pl{len(self.created)}"
+        self.created.append(name)
+        return {"id": playlist_id, "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"}}
+    
+    async def add_tracks_to_playlist(self, playlist_id, track_ids):
+        self.added.setdefault(playlist_id, []).extend(track_ids)
+
+
+def run_transfer(playlists, kinds, spotify, match_store=None):
+    service = TransferService(FakeYandex(playlists), spotify, match_store)
+    return asyncio.run(service.transfer_playlists(kinds))
+
+
+def test_fresh_matches_are_searched_with_market_and_not_reverified():
+    spotify = FakeSpotify()
+    
+    [result] = run_transfer({"likes": [("A", "one"), ("B", "missing")]}, ["likes"], spotify)
+    
+    assert spotify.searches == [("one", "RU"), ("missing", "RU")]
+    assert spotify.verified == [[]]
+    assert result["found_tracks"] == 1
+    assert result["not_found_tracks"] == [{"artist": "B", "title": "missing"}]
+    assert spotify.added == {"pl0": ["one"]}
+
+
+def test_tracks_shared_by_playlists_are_searched_once_and_not_verified():
+    spotify = FakeSpotify(unplayable={"shared"})
+    playlists = {
+        "likes": [("A", "shared"), ("B", "first")],
+        "1": [("A", "shared"), ("C", "second")],
+    }
+    
+    first, second = run_transfer(playlists, ["likes", "1"], spotify)
+    
+    assert [title for title, _ in spotify.searches] == ["shared", "first", "second"]
+    assert spotify.verified == [[], []]
+    assert first["found_tracks"] == 2
+    assert second["found_tracks"] == 2
+
+
+def test_rerun_verifies_stored_matches_and_researches_only_failed():
+    store = MatchStore()
+    playlists = {"likes": [("A", "kept"), ("B", "gone"), ("C", "missing")]}
+    run_transfer(playlists, ["likes"], FakeSpotify(), store)
+    
+    rerun = FakeSpotify(unplayable={"gone"}, ids={"gone": "gone-relinked"})
+    [result] = run_transfer(playlists, ["likes"], rerun, store)
+    
+    assert rerun.verified == [["kept", "gone"]]
+    # Ненайденный в прошлый раз трек ищется снова, проверенный - нет
+    assert rerun.searches == [("missing", "RU"), ("gone", "RU")]
+    assert rerun.added == {"pl0": ["kept", "gone-relinked"]}
+    assert result["found_tracks"] == 2
+    assert store.get("user", "gone", "B") == "gone-relinked"
+
+
+def test_no_playlist_is_created_when_circuit_opens_during_search():
+    spotify = FakeSpotify(open_after=1)
+    
+    with pytest.raises(TransferPausedError) as error:
+        run_transfer({"likes": [("A", "one"), ("B", "two")]}, ["likes"], spotify)
+    
+    assert spotify.created == []
+    assert [result["status"] for result in error.value.results] == [STATUS_CIRCUIT_OPEN]
+
+
+def test_paused_transfer_reports_completed_playlists():
+    spotify = FakeSpotify(open_after=3)
+    playlists = {
+        "likes": [("A", "one"), ("B", "two")],
+        "1": [("C", "three"), ("D", "four")],
+        "2": [("E", "five")],
+    }
+    
+    with pytest.raises(TransferPausedError) as error:
+        run_transfer(playlists, ["likes", "1", "2"], spotify)
+    
+    first, second, third = error.value.results
+    assert isinstance(error.value.error, CircuitOpenError)
+    assert first["status"] == STATUS_COMPLETED
+    assert first["playlist_id"] == "pl0"
+    assert first["found_tracks"] == 2
+    assert second["status"] == third["status"] == STATUS_CIRCUIT_OPEN
+    assert second["playlist_id"] is None
+    assert spotify.created == ["Яндекс Музыка – Мои лайки"]
+
+
+def test_completed_transfer_marks_all_playlists_completed():
+    results = run_transfer({"likes": [("A", "one")], "1": []}, ["likes", "1"], FakeSpotify())
+    
+    assert [result["status"] for result in results] == [STATUS_COMPLETED, STATUS_COMPLETED]
@@ -0,0 +1,151 @@
+"""
+Тесты общих для плейлистов запросов к Яндекс Музыке
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from config import settings
+from services import yandex_service
+from services.circuit_breaker import CircuitBreaker
+from services.yandex_service import YandexMusicService
+
+
+class FakeYandexApi:
+    """
+    Yandex Music API пользователя 42
+    
+    playlists: номер плейлиста -> элементы tracks ответа ("likes" - лайки).
+    renamed: ID трека -> ID, под которым /tracks его возвращает.
+    dropped: ID треков, которых нет в ответе /tracks
+    """
+    
+    def __init__(self, playlists, renamed=None, dropped=()):
+        self.playlists = playlists
+        self.renamed = renamed or {}
+        self.dropped = set(dropped)
+        self.account_requests = 0
+        self.tracks_requests = []
+    
+    async def account_status(self, request: web.Request) -> web.Response:
+        self.account_requests += 1
+        return web.json_response({"result": {"account": {"uid": 42}}})
+    
+    async def likes(self, request: web.Request) -> web.Response:
+        return web.json_response({"result": {"library": {"tracks": self.playlists["likes"]}}})
+    
+    async def playlists_list(self, request: web.Request) -> web.Response:
+        return web.json_response({"result": [
+            {"kind": int(kind), "title": f"Playlist {kind}", "trackCount": len(tracks)}
+            for kind, tracks in self.playlists.items() if kind != "likes"
+        ]})
+    
+    async def playlist(self, request: web.Request) -> web.Response:
+        return web.json_response({"result": {"tracks": self.playlists[request.match_info["kind"]]}})
+    
+    async def tracks(self, request: web.Request) -> web.Response:
+        track_ids = (await request.json())["track-ids"]
+        self.tracks_requests.append(track_ids)
+        
+        result = []
+        for track_id in track_ids:
+            track_id = track_id.split(":")[0]
+            if track_id in self.dropped:
+                continue
+            result.append({
+                "id": self.renamed.get(track_id, track_id),
+                "title": f"Track {track_id}",
+                "artists": [{"name": f"Artist {track_id}"}],
+                "albums": [{"title": "Album"}]
+            })
+        return web.json_response({"result": result})
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    """Отдельный breaker, чтобы тесты не влияли друг на друга"""
+    monkeypatch.setattr(yandex_service, "yandex_breaker", CircuitBreaker("yandex"))
+
+
+def run_service(api: FakeYandexApi, scenario):
+    """Запускает стаб и выполняет scenario(service) на одном экземпляре сервиса"""
+    async def run():
+        app = web.Application()
+        app.router.add_get("/account/status", api.account_status)
+        app.router.add_get("/users/42/likes/tracks", api.likes)
+        app.router.add_get("/users/42/playlists/list", api.playlists_list)
+        app.router.add_get("/users/42/playlists/{kind}", api.playlist)
+        app.router.add_post("/tracks", api.tracks)
+        async with TestServer(app) as server:
+            service = YandexMusicService("token")
+            service.BASE_URL = str(server.make_url("")).rstrip("/")
+            return await scenario(service)
+    
+    return asyncio.run(run())
+
+
+async def transfer_all(service: YandexMusicService):
+    """Получает список плейлистов и треки каждого, как TransferService"""
+    playlists = await service.get_playlists()
+    return [await service.get_playlist_tracks(playlist["kind"]) for playlist in playlists]
+
+
+def overlapping_playlists():
+    """Лайки 1-3 и плейлист 5, который делит с ними треки 2 и 3"""
+    return {
+        "likes": [{"id": "1", "albumId": "10"}, {"id": "2", "albumId": "20"}, {"id": "3", "albumId": "30"}],
+        "5": [{"id": "2", "albumId": "20"}, {"trackId": "6:60"}, {"id": "3", "albumId": "30"}],
+    }
+
+
+def test_shared_tracks_and_account_are_fetched_once():
+    api = FakeYandexApi(overlapping_playlists())
+    
+    likes, playlist = run_service(api, transfer_all)
+    
+    assert api.account_requests == 1
+    assert api.tracks_requests == [["1", "2", "3"], ["6:60"]]
+    assert [track["title"] for track in likes] == ["Track 1", "Track 2", "Track 3"]
+    # Трек с albumId в ID сопоставлен с ответом, где ID без albumId
+    assert [(track["id"], track["title"]) for track in playlist] == [
+        ("2", "Track 2"), ("6:60", "Track 6"), ("3", "Track 3")
+    ]
+
+
+def test_embedded_track_info_is_not_requested():
+    api = FakeYandexApi({
+        "likes": [{"id": "1", "track": {"title": "Embedded", "artists": [{"name": "Artist"}]}}]
+    })
+    
+    [likes] = run_service(api, transfer_all)
+    
+    assert api.tracks_requests == []
+    assert likes == [{"id": "1", "title": "Embedded", "artist": "Artist", "album": ""}]
+
+
+def test_full_response_falls_back_to_request_order():
+    api = FakeYandexApi({"likes": [{"id": "1"}, {"id": "2"}]}, renamed={"2": "200"})
+    
+    [likes] = run_service(api, transfer_all)
+    
+    assert [(track["id"], track["title"]) for track in likes] == [("1", "Track 1"), ("2", "Track 2")]
+
+
+def test_partial_response_skips_unmatched_tracks():
+    api = FakeYandexApi({"likes": [{"id": "1"}, {"id": "2"}, {"id": "3"}]}, renamed={"3": "300"}, dropped={"2"})
+    
+    [likes] = run_service(api, transfer_all)
+    
+    # Без полного ответа порядок ненадёжен: трек под чужим ID не сопоставляется
+    assert [track["id"] for track in likes] == ["1"]
+
+
+def test_track_details_are_refetched_when_cache_is_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "lookup_cache_enabled", False)
+    api = FakeYandexApi(overlapping_playlists())
+    
+    run_service(api, transfer_all)
+    
+    assert api.tracks_requests == [["1", "2", "3"], ["2", "6:60", "3"]]